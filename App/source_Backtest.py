@@ -0,0 +1,127 @@
+import os
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+
+from source_TimeSeries import TimeSeries
+
+# WALK-FORWARD BACKTEST
+#
+# every cutoff date is one fold: the model is trained on the bars up to the cutoff, forecasts forward,
+# and forecast step k is scored against the actual bar k rows after the cutoff
+# folds run in parallel in a process pool, the base series is sent to each worker once (pool initializer)
+# and every fold only receives the row count it trains on
+
+_worker_series = None
+
+
+def _init_worker(dates, columns, daily, tz, tf_threads):
+    global _worker_series
+    if tf_threads is not None:
+        import tensorflow as tf
+        tf.config.threading.set_intra_op_parallelism_threads(tf_threads)
+        tf.config.threading.set_inter_op_parallelism_threads(1)
+    _worker_series = TimeSeries(dates, columns, daily=daily, tz=tz)
+
+def _run_fold(n_rows, forecast_kwargs):
+    import source_Forecast as fc
+    return fc.forecast_fold(_worker_series, n_rows, **forecast_kwargs)
+
+# scores one fold's forecast against the bars that followed the cutoff
+def score_fold(series, n_rows, df_forecast, forecast_variable):
+    predicted = df_forecast[forecast_variable].to_numpy(dtype=float)
+    steps = np.arange(len(predicted))
+
+    # step 0 is the last training bar (the forecast is anchored to it), step k is k bars later
+    actual_rows = n_rows - 1 + steps
+    available = actual_rows < len(series)
+    actual = np.full(len(predicted), np.nan)
+    actual[available] = series.column(forecast_variable)[actual_rows[available]]
+    actual_dates = [series.date_at(row) if ok else None for row, ok in zip(actual_rows, available)]
+
+    error = predicted - actual
+    scored = (steps > 0) & available
+    if scored.any():
+        mae = np.mean(np.abs(error[scored]))
+        rmse = np.sqrt(np.mean(error[scored] ** 2))
+        mape = np.mean(np.abs(error[scored] / actual[scored])) * 100
+    else:
+        mae = rmse = mape = np.nan
+
+    return pd.DataFrame({
+        'step': steps,
+        'date': df_forecast['date'].to_numpy(),
+        'forecast': predicted,
+        'actual_date': actual_dates,
+        'actual': actual,
+        'error': error,
+        'abs_error': np.abs(error),
+        'mae': mae,
+        'rmse': rmse,
+        'mape': mape
+    })
+
+# params:
+#   - df - TimeSeries or dataframe of time series price data (requires a 'date' column)
+#   - cutoffs - list of dates, the model for each fold is trained on the bars up to and including that date
+#   - layers_config, training_cols, forecast_period, epochs, step_future, step_past, dropout, optimizer, loss,
+#     streaming, batch_size - same as source_Forecast.forecast
+#   - max_workers - folds trained at the same time (defaults to half the cores, at most one per fold)
+#   - tf_threads - tensorflow intra-op threads per worker (defaults to cores // max_workers)
+#   - engine - same as source_Forecast.forecast, the numpy baselines run every fold in this process (no pool)
+# returns one tidy frame with a row per (fold, forecast step):
+#   fold, cutoff, step, date, forecast, actual_date, actual, error, abs_error and the fold's mae, rmse, mape
+# step 0 is the anchor bar and is not part of the fold metrics
+def walk_forward(df, cutoffs, layers_config, training_cols=["open", "high", "low", "close", "volume"], forecast_period=10, epochs=10, step_future=2, step_past=16, dropout=0.2, optimizer='adam', loss='mse', streaming=False, batch_size=16, max_workers=None, tf_threads=None, engine='neural'):
+    series = df if isinstance(df, TimeSeries) else TimeSeries.from_frame(df)
+    forecast_variable = training_cols[0]
+
+    # only the columns the model trains on are shipped to the workers
+    columns = {col: series.column(col) for col in training_cols}
+    fold_rows = [series.index_of(cutoff, side='right') for cutoff in cutoffs]
+    for cutoff, n_rows in zip(cutoffs, fold_rows):
+        if n_rows <= step_past + step_future - 1:
+            raise ValueError(f"Cutoff {cutoff} leaves too few bars to train on ({n_rows} rows).")
+
+    cores = os.cpu_count() or 1
+    if max_workers is None:
+        max_workers = max(1, cores // 2)
+    max_workers = max(1, min(max_workers, len(cutoffs)))
+    if tf_threads is None:
+        tf_threads = max(1, cores // max_workers)
+
+    forecast_kwargs = {
+        'layers_config': layers_config,
+        'training_cols': training_cols,
+        'forecast_period': forecast_period,
+        'epochs': epochs,
+        'step_future': step_future,
+        'step_past': step_past,
+        'dropout': dropout,
+        'optimizer': optimizer,
+        'loss': loss,
+        'streaming': streaming,
+        'batch_size': batch_size,
+        'engine': engine
+    }
+
+    if engine != 'neural':
+        # milliseconds per fold, starting a process pool would take longer than the folds
+        import source_Forecast as fc
+        forecasts = [fc.forecast_fold(series, n_rows, **forecast_kwargs) for n_rows in fold_rows]
+    else:
+        # spawn so workers start clean instead of forking a process that may already hold tensorflow/qt state
+        context = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(max_workers=max_workers, mp_context=context, initializer=_init_worker,
+                                 initargs=(series.dates, columns, series.daily, series.tz, tf_threads)) as executor:
+            futures = [executor.submit(_run_fold, n_rows, forecast_kwargs) for n_rows in fold_rows]
+            forecasts = [future.result() for future in futures]
+
+    folds = []
+    for fold, (cutoff, n_rows, df_forecast) in enumerate(zip(cutoffs, fold_rows, forecasts)):
+        scored = score_fold(series, n_rows, df_forecast, forecast_variable)
+        scored.insert(0, 'cutoff', series.date_at(n_rows - 1))
+        scored.insert(0, 'fold', fold)
+        folds.append(scored)
+    return pd.concat(folds, ignore_index=True)
@@ -0,0 +1,120 @@
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from source_Windowing import build_direct_windows
+
+# NUMPY BASELINE FORECAST ENGINES
+#
+# forecasts without tensorflow that return in milliseconds on the full history, used through
+# source_Forecast.forecast(engine=...) as a benchmark baseline and as the preview while a network trains
+# every engine gets the unscaled training matrix (rows, features, column 0 is the forecasted variable)
+# and returns the next horizon values of column 0:
+#   - 'naive' - the last value repeated
+#   - 'drift' - the last value plus the average change per bar over the whole history
+#   - 'ets' - damped additive trend exponential smoothing (holt), alpha and beta picked by the smallest one
+#     step ahead error on the last ETS_WINDOW bars (older bars have no weight left at the smallest alpha)
+#   - 'ar' - ridge autoregression of the bar to bar changes of column 0 on their last n_past changes,
+#     rolled forward one bar at a time
+#   - 'linear' - closed form ridge on the flattened n_past windows of every training column (the windows the
+#     networks train on), one solve gives the change of column 0 after every horizon step (like direct mode)
+
+ENGINES = ('naive', 'drift', 'ets', 'ar', 'linear')
+
+ETS_WINDOW = 1000
+ETS_ALPHAS = np.linspace(0.05, 1.0, 20)
+ETS_BETAS = np.linspace(0.0, 0.5, 11)
+ETS_DAMPING = 0.98
+
+
+def naive(y, horizon):
+    return np.full(horizon, y[-1], dtype=float)
+
+def drift(y, horizon):
+    slope = (y[-1] - y[0]) / (len(y) - 1) if len(y) > 1 else 0.0
+    return y[-1] + slope * np.arange(1, horizon + 1)
+
+def ets(y, horizon, window=ETS_WINDOW, alphas=ETS_ALPHAS, betas=ETS_BETAS, damping=ETS_DAMPING):
+    y = np.asarray(y[-window:], dtype=float)
+    if len(y) < 3:
+        return naive(y, horizon)
+    # every (alpha, beta) pair is smoothed at once, one python step per bar
+    alpha, beta = [grid.ravel() for grid in np.meshgrid(alphas, betas, indexing='ij')]
+    level = np.full(len(alpha), y[0])
+    trend = np.full(len(alpha), y[1] - y[0])
+    sse = np.zeros(len(alpha))
+    for value in y[1:]:
+        predicted = level + damping * trend
+        sse += (value - predicted) ** 2
+        new_level = alpha * value + (1 - alpha) * predicted
+        trend = beta * (new_level - level) + (1 - beta) * damping * trend
+        level = new_level
+
+    best = np.argmin(sse)
+    damped_steps = np.cumsum(damping ** np.arange(1, horizon + 1))
+    return level[best] + damped_steps * trend[best]
+
+# closed form ridge, the penalty is relative to the mean diagonal of x'x so it does not depend on the scale
+def ridge_solve(x, y, ridge=1e-3):
+    gram = x.T @ x
+    penalty = ridge * max(np.trace(gram) / len(gram), 1e-12)
+    return np.linalg.solve(gram + penalty * np.eye(len(gram)), x.T @ y)
+
+def ar(y, horizon, n_lags=16, ridge=1e-3):
+    changes = np.diff(np.asarray(y, dtype=float))
+    if len(changes) <= n_lags + 1:
+        return drift(y, horizon)
+    lags = sliding_window_view(changes, n_lags)[:-1]  # (samples, n_lags), oldest change first
+    targets = changes[n_lags:]
+    mean = changes.mean()
+    x = np.column_stack([lags - mean, np.ones(len(lags))])
+    coefficients = ridge_solve(x, targets - mean, ridge)
+
+    window = list(changes[-n_lags:] - mean)
+    steps = []
+    for _ in range(horizon):
+        step = float(np.dot(coefficients[:-1], window[-n_lags:]) + coefficients[-1])
+        window.append(step)
+        steps.append(step + mean)
+    return y[-1] + np.cumsum(steps)
+
+def linear(matrix, horizon, n_past=16, ridge=1e-3):
+    matrix = np.asarray(matrix, dtype=float)
+    mean = matrix.mean(axis=0)
+    std = matrix.std(axis=0)
+    std[std == 0] = 1.0
+    scaled = (matrix - mean) / std
+    if len(scaled) < n_past + horizon + 1:
+        return drift(matrix[:, 0], horizon)
+
+    windows, targets = build_direct_windows(scaled, n_past, horizon)
+    x = np.column_stack([windows.reshape(len(windows), -1), np.ones(len(windows))])
+    # the change of column 0 from the last bar of the window, every horizon step is one right hand side
+    coefficients = ridge_solve(x, targets - windows[:, -1, 0:1], ridge)
+
+    last = np.append(scaled[-n_past:].ravel(), 1.0)
+    return (scaled[-1, 0] + last @ coefficients) * std[0] + mean[0]
+
+# params:
+#   - engine - one of ENGINES
+#   - matrix - unscaled training matrix (rows, features), column 0 is the forecasted variable
+#   - horizon - bars to forecast after the last row
+#   - n_past - lags of 'ar' and window length of 'linear' (step_past)
+# returns an array of horizon forecasted values of column 0
+def baseline_forecast(engine, matrix, horizon, n_past=16):
+    if engine not in ENGINES:
+        raise ValueError(f"`engine` must be 'neural' or one of {ENGINES}, but got {engine}.")
+    matrix = np.asarray(matrix, dtype=float)
+    if len(matrix) == 0:
+        raise ValueError("Not enough rows to forecast from, got 0.")
+    y = matrix[:, 0]
+    if horizon <= 0:
+        return np.zeros(0)
+    if engine == 'naive':
+        return naive(y, horizon)
+    if engine == 'drift':
+        return drift(y, horizon)
+    if engine == 'ets':
+        return ets(y, horizon)
+    if engine == 'ar':
+        return ar(y, horizon, n_lags=n_past)
+    return linear(matrix, horizon, n_past=n_past)
@@ -0,0 +1,171 @@
+import os
+import sys
+import glob
+import json
+import time
+import argparse
+import pandas as pd
+
+import source_Misc as mc
+import source_Resample as rs
+from source_TimeSeries import TimeSeries
+from source_ModelRegistry import ModelRegistry
+from source_JobScheduler import JobScheduler, DONE, CANCELLED
+from source_TrainingProcess import ProcessRunner
+
+# HEADLESS BATCH FORECASTING
+#
+# runs the forecast of a saved model_params json (the layout CreateModelWindow emits) over many tickers
+# or csv files without Qt, every run is a source_JobScheduler job trained in its own process
+#
+# run from the App folder:
+#     python source_BatchForecast.py model_params.json --tickers AAPL MSFT NVDA --out results.parquet
+#     python source_BatchForecast.py model_params.json --csv "data/*.csv" --out results.csv --workers 4
+#
+# the output has one row per (run, forecast step), runs that failed have a single row without a forecast:
+#   run, source, status, exit_code, error, rows, load_s, wait_s, train_s, step, date, forecast
+# run exit codes: 0 done, 1 training failed, 2 data could not be loaded, 3 cancelled
+# the process exits with 0 when every run is done and 1 otherwise
+
+EXIT_DONE = 0
+EXIT_FAILED = 1
+EXIT_NO_DATA = 2
+EXIT_CANCELLED = 3
+
+
+def load_params(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+# loads every source, returns ({run: TimeSeries}, {run: error text}, {run: load seconds}, {run: source})
+def load_sources(tickers=None, csv_pattern=None, interval='1d', bars=None):
+    series = {}
+    errors = {}
+    load_s = {}
+    sources = {}
+
+    if tickers:
+        start = time.perf_counter()
+        frames, ticker_errors = mc.get_data_many(tickers, interval=interval)
+        elapsed = (time.perf_counter() - start) / max(len(tickers), 1)  # fetched concurrently, split evenly
+        for ticker in tickers:
+            run = f"{ticker}_{bars or interval}"
+            sources[run] = ticker
+            load_s[run] = elapsed
+            if ticker in ticker_errors:
+                errors[run] = f"{ticker_errors[ticker].error_type}: {ticker_errors[ticker].message}"
+            elif frames.get(ticker) is None or len(frames[ticker]) == 0:
+                errors[run] = "No data."
+            else:
+                series[run] = TimeSeries.from_frame(frames[ticker])
+
+    if csv_pattern:
+        for path in sorted(glob.glob(csv_pattern)):
+            run = os.path.splitext(os.path.basename(path))[0]
+            sources[run] = path
+            start = time.perf_counter()
+            df = mc.read_csv(path)
+            load_s[run] = time.perf_counter() - start
+            if df is None or len(df) == 0:
+                errors[run] = "Could not read the csv file."
+            else:
+                series[run] = TimeSeries.from_frame(df)
+
+    # same bar sizes as the gui, built from the download interval
+    if bars is not None and bars != interval:
+        cache = rs.ResampleCache()
+        for run in list(series.keys()):
+            cache.set_source(series[run], interval)
+            series[run] = cache.get(bars)
+    return series, errors, load_s, sources
+
+# params:
+#   - model_params - dict with the CreateModelWindow layout (see source_Misc.forecast_kwargs_from_params)
+#   - tickers - optional list of tickers downloaded with source_Misc.get_data_many
+#   - csv_pattern - optional glob of csv files (read with source_Misc.read_csv), the run is named after the file
+#   - interval - download interval of the tickers (csv files are used as they are)
+#   - bars - optional bar size the data is resampled to before training (defaults to interval)
+#   - max_workers - runs trained at the same time (defaults to the JobScheduler default)
+#   - use_registry - reuse and fine-tune models of earlier runs (see source_ModelRegistry)
+# returns the tidy results frame
+def run_batch(model_params, tickers=None, csv_pattern=None, interval='1d', bars=None, max_workers=None, use_registry=True):
+    series, load_errors, load_s, sources = load_sources(tickers, csv_pattern, interval, bars)
+
+    def on_progress(job, stats):
+        loss = f"{stats['loss']:.5f}" if stats['loss'] is not None else "-"
+        print(f"{job.label}: epoch {stats['epoch']}/{stats['epochs']} loss {loss} eta {stats['eta_s']:.0f}s", flush=True)
+
+    scheduler = JobScheduler(max_concurrent=max_workers, on_progress=on_progress, runner=ProcessRunner(), configure_threads=False)
+    registry = ModelRegistry() if use_registry else None
+    jobs = {}
+    for run, data in series.items():
+        forecast_kwargs = mc.forecast_kwargs_from_params(model_params)
+        forecast_kwargs.update({'df': data, 'ticker': run, 'registry': registry})
+        jobs[run] = scheduler.submit(forecast_kwargs, label=run)
+    scheduler.shutdown(cancel=False, wait=True)
+
+    target = model_params['training_cols'][0]
+    parts = []
+    for run in sources:
+        row = {'run': run, 'source': sources[run], 'rows': len(series[run]) if run in series else 0, 'load_s': load_s.get(run)}
+        job = jobs.get(run)
+        if job is None:
+            row.update({'status': 'no data', 'exit_code': EXIT_NO_DATA, 'error': load_errors.get(run), 'wait_s': None, 'train_s': None})
+        else:
+            exit_code = {DONE: EXIT_DONE, CANCELLED: EXIT_CANCELLED}.get(job.state, EXIT_FAILED)
+            row.update({'status': job.state, 'exit_code': exit_code, 'error': str(job.error) if job.error is not None else None,
+                        'wait_s': job.wait_s(), 'train_s': job.run_s()})
+
+        if job is not None and job.state == DONE:
+            forecast = job.result
+            part = pd.DataFrame({'step': range(len(forecast)), 'date': forecast['date'].to_numpy(), 'forecast': forecast[target].to_numpy(dtype=float)})
+            for name, value in row.items():
+                part[name] = value
+        else:
+            part = pd.DataFrame([dict(row, step=None, date=None, forecast=None)])
+        parts.append(part)
+
+    columns = ['run', 'source', 'status', 'exit_code', 'error', 'rows', 'load_s', 'wait_s', 'train_s', 'step', 'date', 'forecast']
+    if not parts:
+        return pd.DataFrame(columns=columns)
+    return pd.concat(parts, ignore_index=True)[columns]
+
+# parquet (needs pyarrow or fastparquet) or csv, by extension
+def write_results(results, out_path):
+    results = results.copy()
+    results['date'] = results['date'].astype(str).where(results['date'].notna(), None)
+    if out_path.lower().endswith('.csv'):
+        results.to_csv(out_path, index=False)
+    else:
+        results.to_parquet(out_path, index=False)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run saved model_params forecasts over many tickers or csv files.")
+    parser.add_argument('params', help="model_params json file (the layout CreateModelWindow saves)")
+    parser.add_argument('--tickers', nargs='+', help="tickers to download and forecast")
+    parser.add_argument('--csv', dest='csv_pattern', help="glob of csv files to forecast (time column first)")
+    parser.add_argument('--interval', default='1d', help="download interval of the tickers")
+    parser.add_argument('--bars', default=None, help="bar size the data is resampled to before training")
+    parser.add_argument('--workers', type=int, default=None, help="runs trained at the same time")
+    parser.add_argument('--no-registry', action='store_true', help="always train from scratch")
+    parser.add_argument('--out', default='forecasts.parquet', help="output file, .parquet or .csv")
+    args = parser.parse_args(argv)
+    if not args.tickers and not args.csv_pattern:
+        parser.error("give --tickers and/or --csv")
+
+    start = time.perf_counter()
+    results = run_batch(load_params(args.params), tickers=args.tickers, csv_pattern=args.csv_pattern, interval=args.interval,
+        bars=args.bars, max_workers=args.workers, use_registry=not args.no_registry)
+    write_results(results, args.out)
+
+    runs = results.drop_duplicates('run')
+    for _, run in runs.iterrows():
+        train_s = f"{run['train_s']:.1f}s" if pd.notna(run['train_s']) else "-"
+        print(f"{run['run']:>16} | {run['status']:>9} | exit {run['exit_code']} | train {train_s}" + (f" | {run['error']}" if run['error'] else ""))
+    print(f"{len(runs)} runs in {time.perf_counter() - start:.1f}s, results written to {args.out}")
+    return EXIT_DONE if (runs['exit_code'] == EXIT_DONE).all() else EXIT_FAILED
+
+
+if __name__ == "__main__":
+    sys.exit(main())
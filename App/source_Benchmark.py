@@ -0,0 +1,226 @@
+import sys
+import time
+import tracemalloc
+import numpy as np
+
+import source_Windowing as sw
+
+# BENCHMARKS
+#
+# run from the App folder:
+#     python source_Benchmark.py windows
+#     python source_Benchmark.py training
+#     python source_Benchmark.py streaming
+#     python source_Benchmark.py layers
+#     python source_Benchmark.py baselines
+
+
+# returns (best wall time in seconds, peak traced memory in bytes, result of the last call)
+def measure(fn, repeat=3):
+    best = float('inf')
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return best, peak, result
+
+# training window construction: per sample python loop vs strided views
+def bench_windows(sizes=(5_000, 50_000, 500_000), n_past=16, n_future=2, n_features=5, repeat=3):
+    rng = np.random.default_rng(0)
+    results = []
+    for n_rows in sizes:
+        scaled = rng.standard_normal((n_rows, n_features))
+        loop_s, loop_peak, (loopX, loopY) = measure(lambda: sw.build_windows_loop(scaled, n_past, n_future), repeat)
+        view_s, view_peak, (viewX, viewY) = measure(lambda: sw.build_windows(scaled, n_past, n_future), repeat)
+        identical = np.array_equal(loopX, viewX) and np.array_equal(loopY, viewY)
+
+        results.append({
+            'rows': n_rows,
+            'loop_s': loop_s,
+            'view_s': view_s,
+            'speedup': loop_s / max(view_s, 1e-9),
+            'loop_peak_mb': loop_peak / 1e6,
+            'view_peak_mb': view_peak / 1e6,
+            'identical': identical
+        })
+        print(f"{n_rows:>9} rows | loop {loop_s * 1e3:9.2f} ms, {loop_peak / 1e6:8.1f} MB | "
+              f"views {view_s * 1e3:7.3f} ms, {view_peak / 1e6:6.3f} MB | "
+              f"{loop_s / max(view_s, 1e-9):9.0f}x | identical: {identical}")
+    return results
+
+# training throughput of SequentialModel: default float64 path vs float32 + XLA (+ steps_per_execution, bfloat16)
+# every mode is fit once untimed first so graph tracing and XLA compilation are not counted
+TRAINING_MODES = {
+    'default': {'dtype': np.float64, 'jit_compile': 'auto', 'steps_per_execution': 1, 'mixed_precision': False},
+    'float32': {'dtype': np.float32, 'jit_compile': 'auto', 'steps_per_execution': 1, 'mixed_precision': False},
+    'float32+spe16': {'dtype': np.float32, 'jit_compile': 'auto', 'steps_per_execution': 16, 'mixed_precision': False},
+    'float32+xla': {'dtype': np.float32, 'jit_compile': True, 'steps_per_execution': 1, 'mixed_precision': False},
+    'float32+xla+spe16': {'dtype': np.float32, 'jit_compile': True, 'steps_per_execution': 16, 'mixed_precision': False},
+    'bfloat16+xla+spe16': {'dtype': np.float32, 'jit_compile': True, 'steps_per_execution': 16, 'mixed_precision': True},
+}
+
+def bench_training(n_rows=20_000, n_past=16, n_future=2, n_features=5, epochs=2, batch_size=64, layers_config=None, modes=None):
+    from source_SequentialModel import SequentialModel
+
+    if layers_config is None:
+        layers_config = [{'neurons': 64, 'layer_type': 'LSTM', 'return_sequences': True},
+                         {'neurons': 32, 'layer_type': 'LSTM', 'return_sequences': False}]
+    if modes is None:
+        modes = list(TRAINING_MODES.keys())
+
+    rng = np.random.default_rng(0)
+    scaled = rng.standard_normal((n_rows, n_features))
+    results = []
+    for name in modes:
+        mode = TRAINING_MODES[name]
+        trainX, trainY = sw.build_windows(scaled.astype(mode['dtype']), n_past, n_future)
+        model = SequentialModel(input_shape=(n_past, n_features), output_shape=1, layers_config=layers_config, dropout=0.2,
+            optimizer='adam', loss='mse', jit_compile=mode['jit_compile'], steps_per_execution=mode['steps_per_execution'],
+            mixed_precision=mode['mixed_precision']).get_model()
+        model.fit(trainX[:batch_size * 32], trainY[:batch_size * 32], epochs=1, batch_size=batch_size, verbose=0)
+
+        start = time.perf_counter()
+        history = model.fit(trainX, trainY, epochs=epochs, batch_size=batch_size, verbose=0)
+        fit_s = time.perf_counter() - start
+        start = time.perf_counter()
+        model.predict(trainX, batch_size=1024, verbose=0)
+        predict_s = time.perf_counter() - start
+
+        results.append({
+            'mode': name,
+            'train_samples_per_s': len(trainX) * epochs / fit_s,
+            'predict_samples_per_s': len(trainX) / predict_s,
+            'final_loss': history.history['loss'][-1]
+        })
+
+    base = results[0]['train_samples_per_s']
+    for result in results:
+        print(f"{result['mode']:>20} | train {result['train_samples_per_s']:10.0f} samples/s ({result['train_samples_per_s'] / base:5.2f}x) | "
+              f"predict {result['predict_samples_per_s']:10.0f} samples/s | loss {result['final_loss']:.4f}")
+    return results
+
+# per bar updates: streamed recurrent steps (source_StreamingModel) vs rerunning the windows, on an untrained
+# model with random weights, the exact mode has to match the windowed outputs
+def bench_streaming(n_rows=2_000, n_past=16, n_features=5, n_streams=1, layers_config=None):
+    from source_SequentialModel import SequentialModel
+    from source_StreamingModel import MODES, verify_equivalence
+
+    if layers_config is None:
+        layers_config = [{'neurons': 64, 'layer_type': 'LSTM', 'return_sequences': True},
+                         {'neurons': 32, 'layer_type': 'GRU', 'return_sequences': False}]
+    model = SequentialModel(input_shape=(n_past, n_features), output_shape=1, layers_config=layers_config,
+                            dropout=0.2, optimizer='adam', loss='mse').get_model()
+    scaled = np.random.default_rng(0).standard_normal((n_rows, n_features))
+
+    results = []
+    for mode in MODES:
+        result = verify_equivalence(model, scaled, n_past, mode=mode, n_streams=n_streams)
+        results.append(result)
+        print(f"{mode:>6} | streamed {result['streamed_us_per_bar']:8.1f} us/bar | windowed batch {result['windowed_batch_us_per_window']:8.1f} us/window | "
+              f"max abs diff {result['max_abs']:.2e}")
+    return results
+
+# wall time per epoch of two layer models of every type against LSTM, the neurons of the other types are picked
+# so the model has about as many parameters as the LSTM one
+# at equal parameters the flops per window are similar, the window-parallel types gain with more cores (the
+# recurrent ones have to step through the window one bar at a time) and larger batches
+def bench_layers(n_rows=20_000, n_past=16, n_future=2, n_features=5, epochs=3, batch_size=64, lstm_neurons=(64, 32),
+                 layer_types=('LSTM', 'GRU', 'Conv1D', 'Attention')):
+    from source_SequentialModel import SequentialModel
+
+    def build(layer_type, neurons):
+        layers_config = [{'neurons': neurons[0], 'layer_type': layer_type, 'return_sequences': True},
+                         {'neurons': neurons[1], 'layer_type': layer_type, 'return_sequences': False}]
+        return SequentialModel(input_shape=(n_past, n_features), output_shape=1, layers_config=layers_config,
+                               dropout=0.2, optimizer='adam', loss='mse').get_model()
+
+    # same width ratio as the lstm layers, bisect the width until the parameter count is matched
+    def matched_neurons(layer_type, target):
+        ratio = lstm_neurons[1] / lstm_neurons[0]
+        low, high = 1, 1024
+        while low < high:
+            width = (low + high) // 2
+            if build(layer_type, (width, max(1, round(width * ratio)))).count_params() < target:
+                low = width + 1
+            else:
+                high = width
+        return (low, max(1, round(low * ratio)))
+
+    # a random walk, so the loss is not pure noise
+    rng = np.random.default_rng(0)
+    series = np.cumsum(rng.standard_normal((n_rows, n_features)), axis=0)
+    scaled = ((series - series.mean(axis=0)) / series.std(axis=0)).astype(np.float32)
+    trainX, trainY = sw.build_windows(scaled, n_past, n_future)
+    target = build('LSTM', lstm_neurons).count_params()
+
+    results = []
+    for layer_type in layer_types:
+        neurons = lstm_neurons if layer_type == 'LSTM' else matched_neurons(layer_type, target)
+        model = build(layer_type, neurons)
+        model.fit(trainX[:batch_size * 32], trainY[:batch_size * 32], epochs=1, batch_size=batch_size, verbose=0)
+
+        # best epoch, a shared host makes single epochs noisy
+        epoch_s = float('inf')
+        for _ in range(epochs):
+            start = time.perf_counter()
+            history = model.fit(trainX, trainY, epochs=1, batch_size=batch_size, validation_split=0.1, verbose=0)
+            epoch_s = min(epoch_s, time.perf_counter() - start)
+        results.append({
+            'layer_type': layer_type,
+            'neurons': neurons,
+            'params': model.count_params(),
+            'epoch_s': epoch_s,
+            'val_loss': history.history['val_loss'][-1]
+        })
+
+    base = results[0]['epoch_s']
+    for result in results:
+        print(f"{result['layer_type']:>10} {str(result['neurons']):>10} | {result['params']:7d} params | {result['epoch_s']:6.2f} s/epoch "
+              f"({base / result['epoch_s']:5.2f}x) | val_loss {result['val_loss']:.4f}")
+    return results
+
+# numpy baseline engines (source_Baselines): time per forecast on the full history and a walk-forward backtest
+# of every engine on the same random walk (none of them should beat naive by much on one)
+def bench_baselines(n_rows=100_000, n_folds=50, forecast_period=11, step_past=16):
+    import pandas as pd
+    import source_Forecast as fc
+    from source_Backtest import walk_forward
+    from source_Baselines import ENGINES
+    from source_TimeSeries import TimeSeries
+
+    rng = np.random.default_rng(0)
+    close = 100 + np.cumsum(rng.standard_normal(n_rows))
+    frame = pd.DataFrame({'date': pd.date_range('2000-01-01', periods=n_rows, freq='h'), 'open': close, 'high': close + 1,
+                          'low': close - 1, 'close': close, 'volume': rng.integers(100_000, 1_000_000, n_rows).astype(float)})
+    series = TimeSeries.from_frame(frame)
+    cutoffs = [series.date_at(row) for row in np.linspace(n_rows // 2, n_rows - forecast_period - 1, n_folds).astype(int)]
+
+    results = []
+    for engine in ENGINES:
+        best, _, _ = measure(lambda: fc.forecast(series, None, 'open', forecast_period=forecast_period, step_past=step_past, engine=engine))
+        scored = walk_forward(series, cutoffs, None, forecast_period=forecast_period, step_past=step_past, engine=engine)
+        results.append({'engine': engine, 'forecast_ms': best * 1e3, 'mae': float(scored.loc[scored['step'] > 0, 'abs_error'].mean())})
+
+    for result in results:
+        print(f"{result['engine']:>8} | {result['forecast_ms']:8.1f} ms per forecast on {n_rows} rows | walk-forward mae {result['mae']:.4f}")
+    return results
+
+
+BENCHMARKS = {
+    'windows': bench_windows,
+    'training': bench_training,
+    'streaming': bench_streaming,
+    'layers': bench_layers,
+    'baselines': bench_baselines,
+}
+
+if __name__ == "__main__":
+    names = sys.argv[1:] or list(BENCHMARKS.keys())
+    for name in names:
+        print(f"---- {name} ----")
+        BENCHMARKS[name]()
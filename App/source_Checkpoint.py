@@ -0,0 +1,110 @@
+import os
+import json
+import time
+
+# COOPERATIVE CANCELLATION AND CHECKPOINT / RESUME
+#
+# cancellation:
+#   - the caller owns a threading.Event and sets it to cancel, the training loop checks it after every batch
+#     and stops at that batch boundary, forecast then raises TrainingCancelled
+# checkpoints:
+#   - every checkpoint_every epochs the model (weights and optimizer state) is written to
+#     cache/checkpoints/<key>/ together with the number of finished epochs
+#   - the key covers the config and a fingerprint of the training rows, so the same run started again
+#     (after a cancel or a crash) resumes from its last checkpoint with the same optimizer state
+#   - a run that finishes removes its checkpoint
+#   - a cancelled run writes one more checkpoint, its weights are mid epoch and it is resumed
+#     from the last epoch that finished
+
+CHECKPOINT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cache', 'checkpoints')
+
+
+class TrainingCancelled(Exception):
+    def __init__(self, epochs_done=0):
+        super().__init__(f"Training was cancelled after {epochs_done} finished epochs.")
+        self.epochs_done = epochs_done
+
+
+class CheckpointStore:
+
+    def __init__(self, root=CHECKPOINT_DIR):
+        """
+        On-disk checkpoints of unfinished training runs keyed by source_ModelRegistry.config_key.
+
+        Parameters:
+        - root: Folder the checkpoints are stored in.
+        """
+        self.root = root
+
+    def entry_path(self, key):
+        return os.path.join(self.root, key)
+
+    def load(self, key):
+        """
+        Returns (model, epochs_done) of the last checkpoint for a key, or None if there is none.
+        """
+        path = self.entry_path(key)
+        if not os.path.exists(os.path.join(path, 'state.json')):
+            return None
+        try:
+            from tensorflow.keras.models import load_model # type: ignore
+            import source_Layers  # registers the custom layer types load_model may need
+            with open(os.path.join(path, 'state.json'), 'r', encoding='utf-8') as f:
+                state = json.load(f)
+            model = load_model(os.path.join(path, 'model.keras'))
+            return model, state['epochs_done']
+        except Exception as e:
+            print(f"ignoring unreadable checkpoint {path}: {e}")
+            return None
+
+    def save(self, key, model, epochs_done):
+        path = self.entry_path(key)
+        os.makedirs(path, exist_ok=True)
+
+        # the model is written next to the old one and swapped in, a crash mid write keeps the last checkpoint
+        tmp_path = os.path.join(path, 'model.tmp.keras')
+        model.save(tmp_path)
+        os.replace(tmp_path, os.path.join(path, 'model.keras'))
+        with open(os.path.join(path, 'state.json.tmp'), 'w', encoding='utf-8') as f:
+            json.dump({'epochs_done': epochs_done, 'saved_at': time.time()}, f, indent=4)
+        os.replace(os.path.join(path, 'state.json.tmp'), os.path.join(path, 'state.json'))
+
+    def remove(self, key):
+        path = self.entry_path(key)
+        for name in ('state.json', 'model.keras', 'state.json.tmp', 'model.tmp.keras'):
+            file_path = os.path.join(path, name)
+            if os.path.exists(file_path):
+                os.remove(file_path)
+        if os.path.isdir(path) and not os.listdir(path):
+            os.rmdir(path)
+
+# params:
+#   - cancel - threading.Event that cancels the fit when set (None never cancels)
+#   - store, key - optional CheckpointStore and run key, when set the model is checkpointed every `every` epochs
+#   - every - epochs between checkpoints
+# returns a keras callback, .epochs_done is the number of finished epochs (counting the resumed ones)
+def make_training_control(cancel=None, store=None, key=None, every=None):
+    from tensorflow.keras.callbacks import Callback # type: ignore
+
+    class TrainingControl(Callback):
+        def __init__(self):
+            super().__init__()
+            self.epochs_done = 0
+            self.cancelled = False
+
+        def on_epoch_begin(self, epoch, logs=None):
+            self.epochs_done = epoch  # resumed fits start at initial_epoch
+
+        def on_train_batch_end(self, batch, logs=None):
+            if cancel is not None and cancel.is_set():
+                self.cancelled = True
+                self.model.stop_training = True
+
+        def on_epoch_end(self, epoch, logs=None):
+            if self.cancelled:
+                return  # the epoch was cut short
+            self.epochs_done = epoch + 1
+            if store is not None and every and self.epochs_done % every == 0 and self.epochs_done < self.params.get('epochs', 0):
+                store.save(key, self.model, self.epochs_done)
+
+    return TrainingControl()
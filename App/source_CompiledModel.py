@@ -0,0 +1,168 @@
+import os
+import json
+import time
+import numpy as np
+
+# COMPILED INFERENCE MODELS
+#
+# a trained keras model is exported to a tensorflow lite flatbuffer for forecasting outside the keras predict loop
+#   - the model call is traced for a single (1, n_past, features) window and its variables are frozen into
+#     constants, that frozen concrete function is what the converter gets (tflite can not lower the recurrent
+#     loops of a dynamic batch size, and unfrozen variables are not readable by the interpreter)
+#   - quantization:
+#       * 'float32' - no quantization, same numbers as keras up to float rounding
+#       * 'float16' - weights stored as float16 (about half the size)
+#       * 'int8' - dynamic range quantization, weights stored as int8 and activations stay float
+#         (full integer quantization needs calibration windows and crashes the converter on recurrent layers)
+#   - CompiledModel loads a flatbuffer in milliseconds and predicts one window per interpreter call
+#   - drift_report compares a compiled model against its keras model on the same windows
+# models trained with mixed_precision (bfloat16 layers) are not supported by the converter
+#
+# registry entries (see source_ModelRegistry) get the exported model next to model.keras:
+#   - model_<quantization>.tflite and compiled_<quantization>.json (the drift report of the export)
+
+QUANTIZATIONS = ('float32', 'float16', 'int8')
+
+
+# a handful of windows through a direct model call, model.predict builds a dataset and runs
+# its whole predict loop per call which costs far more than the forward pass of a few windows
+def predict_windows(model, windows):
+    return np.asarray(model(np.asarray(windows, dtype=np.float32), training=False), dtype=np.float64)
+
+
+def _check_quantization(quantization):
+    if quantization not in QUANTIZATIONS:
+        raise ValueError(f"`quantization` must be one of {QUANTIZATIONS}, but got {quantization}.")
+
+# params:
+#   - model - trained keras model taking (batch, n_past, features) windows
+#   - n_past, n_features - window length and number of training columns
+#   - quantization - one of QUANTIZATIONS
+# returns the tflite flatbuffer bytes
+def export_tflite(model, n_past, n_features, quantization='float32'):
+    _check_quantization(quantization)
+    import tensorflow as tf
+    from tensorflow.python.framework.convert_to_constants import convert_variables_to_constants_v2
+
+    call = tf.function(lambda windows: model(windows, training=False))
+    concrete = call.get_concrete_function(tf.TensorSpec([1, n_past, n_features], tf.float32))
+    frozen = convert_variables_to_constants_v2(concrete)
+
+    converter = tf.lite.TFLiteConverter.from_concrete_functions([frozen])
+    if quantization != 'float32':
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    if quantization == 'float16':
+        converter.target_spec.supported_types = [tf.float16]
+    return converter.convert()
+
+
+class CompiledModel:
+
+    def __init__(self, model_content, num_threads=1):
+        """
+        TensorFlow Lite interpreter of an exported model.
+
+        Parameters:
+        - model_content: Bytes of the flatbuffer (see export_tflite).
+        - num_threads: Integer, interpreter threads (one window is too small to split further).
+        """
+        import tensorflow as tf
+
+        start = time.perf_counter()
+        self.interpreter = tf.lite.Interpreter(model_content=model_content, num_threads=num_threads)
+        self.interpreter.allocate_tensors()
+        self.input = self.interpreter.get_input_details()[0]
+        self.output = self.interpreter.get_output_details()[0]
+        self.input_shape = tuple(self.input['shape'][1:])  # (n_past, features)
+        self.size_bytes = len(model_content)
+        self.load_s = time.perf_counter() - start
+
+    @classmethod
+    def from_file(cls, path, num_threads=1):
+        with open(path, 'rb') as f:
+            return cls(f.read(), num_threads=num_threads)
+
+    def predict(self, windows):
+        """
+        Runs a batch of (n_past, features) windows one by one, returns an array with one output row per window.
+        """
+        windows = np.asarray(windows, dtype=np.float32)
+        if windows.shape[1:] != self.input_shape:
+            raise ValueError(f"`windows` must have the shape (batch, {self.input_shape[0]}, {self.input_shape[1]}), but got {windows.shape}.")
+        outputs = []
+        for window in windows:
+            self.interpreter.set_tensor(self.input['index'], window[None])
+            self.interpreter.invoke()
+            outputs.append(self.interpreter.get_tensor(self.output['index'])[0].copy())
+        return np.array(outputs)
+
+# params:
+#   - model - the keras model the compiled model was exported from
+#   - compiled - CompiledModel
+#   - windows - (n, n_past, features) scaled windows, defaults to standard normal windows (the scale the
+#     StandardScaler puts the training data on)
+#   - n_windows - number of default windows
+# returns a dictionary with the drift (scaled units) and the time per window of both models
+def drift_report(model, compiled, windows=None, n_windows=256):
+    if windows is None:
+        windows = np.random.default_rng(0).standard_normal((n_windows,) + compiled.input_shape)
+    windows = np.asarray(windows, dtype=np.float32)
+
+    start = time.perf_counter()
+    expected = predict_windows(model, windows)
+    keras_s = time.perf_counter() - start
+    start = time.perf_counter()
+    actual = compiled.predict(windows).astype(np.float64)
+    compiled_s = time.perf_counter() - start
+
+    error = np.abs(actual - expected)
+    spread = float(expected.std()) or 1.0
+    return {
+        'windows': len(windows),
+        'max_abs': float(error.max()),
+        'mean_abs': float(error.mean()),
+        'max_rel_to_std': float(error.max() / spread),  # worst error relative to the spread of the keras outputs
+        'keras_batch_us_per_window': keras_s / len(windows) * 1e6,
+        'compiled_us_per_window': compiled_s / len(windows) * 1e6,
+        'size_bytes': compiled.size_bytes,
+        'load_ms': compiled.load_s * 1e3
+    }
+
+# exports a registry entry, writes model_<quantization>.tflite and its drift report next to model.keras
+# returns (CompiledModel, drift report)
+def export_registry_entry(registry, key, quantization='float32', windows=None):
+    _check_quantization(quantization)
+    saved = registry.load(key)
+    if saved is None:
+        raise KeyError(f"No model in the registry for key {key}.")
+    model, _, meta = saved
+    if 'hyperparams' not in meta:
+        raise ValueError(f"Registry entry {key} was saved without its hyperparams, forecast it once more to update it.")
+    hyperparams = meta['hyperparams']
+
+    content = export_tflite(model, hyperparams['step_past'], len(hyperparams['training_cols']), quantization)
+    compiled = CompiledModel(content)
+    report = drift_report(model, compiled, windows)
+    report['quantization'] = quantization
+    report['exported_at'] = time.time()
+
+    path = registry.entry_path(key)
+    with open(os.path.join(path, f'model_{quantization}.tflite'), 'wb') as f:
+        f.write(content)
+    with open(os.path.join(path, f'compiled_{quantization}.json'), 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=4)
+    return compiled, report
+
+# returns (CompiledModel, drift report) of an exported registry entry, or None if it was not exported
+def load_registry_entry(registry, key, quantization='float32'):
+    _check_quantization(quantization)
+    path = registry.entry_path(key)
+    model_path = os.path.join(path, f'model_{quantization}.tflite')
+    report_path = os.path.join(path, f'compiled_{quantization}.json')
+    if not os.path.exists(model_path):
+        return None
+    report = None
+    if os.path.exists(report_path):
+        with open(report_path, 'r', encoding='utf-8') as f:
+            report = json.load(f)
+    return CompiledModel.from_file(model_path), report
@@ -0,0 +1,132 @@
+import os
+import json
+import time
+import numpy as np
+import pandas as pd
+
+# ON-DISK OHLCV CACHE
+#
+# used by source_Misc.get_data so reopening a ticker does not redownload its whole history
+# layout:
+#   - one .npz file per ticker and interval (cache/ohlcv/<TICKER>_<interval>.npz)
+#   - every column is stored as its own contiguous array:
+#       * date - int64 epoch nanoseconds (UTC)
+#       * open, high, low, close, volume - float64
+#   - a 'meta' entry holds a small json string with the fetch bookkeeping:
+#       * version - cache layout version, files with another version are ignored
+#       * tz - timezone of the original index so it can be restored on load
+#       * fetched_at - unix time of the last network check (incremental or full)
+#       * full_fetched_at - unix time of the last full history download
+
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cache', 'ohlcv')
+CACHE_VERSION = 1
+
+OHLCV_COLUMNS = ["Open", "High", "Low", "Close", "Volume"]
+PRICE_COLUMNS = ["Open", "High", "Low", "Close"]
+
+# seconds a cached file is trusted without any network call
+DEFAULT_TTL = {
+    '1m': 60,
+    '5m': 5 * 60,
+    '15m': 15 * 60,
+    '30m': 30 * 60,
+    '1h': 60 * 60,
+    '1d': 6 * 60 * 60,
+    '1wk': 24 * 60 * 60,
+    '1mo': 24 * 60 * 60,
+}
+
+# seconds after which the full history is downloaded again to pick up restated bars
+# (split and dividend adjustments rewrite the whole back history, not only the new bars)
+FULL_REFRESH_AGE = 7 * 24 * 60 * 60
+
+
+def cache_path(ticker, interval='1d'):
+    safe_ticker = ticker.upper().replace('/', '-').replace('\\', '-')
+    return os.path.join(CACHE_DIR, f"{safe_ticker}_{interval}.npz")
+
+def ttl_for(interval):
+    return DEFAULT_TTL.get(interval, DEFAULT_TTL['1d'])
+
+# returns (history, meta) where history is indexed like yf.Ticker.history output, or None on a miss
+def load(ticker, interval='1d'):
+    path = cache_path(ticker, interval)
+    if not os.path.exists(path):
+        return None
+    try:
+        with np.load(path, allow_pickle=False) as npz:
+            meta = json.loads(str(npz['meta']))
+            if meta.get('version') != CACHE_VERSION:
+                return None
+            index = pd.to_datetime(npz['date'], utc=True)
+            if meta.get('tz'):
+                index = index.tz_convert(meta['tz'])
+            index.name = 'Date'
+            history = pd.DataFrame({col: npz[col.lower()] for col in OHLCV_COLUMNS}, index=index)
+        return history, meta
+    except Exception as e:
+        # a corrupt or half written file is treated as a miss and gets overwritten
+        print(f"ignoring unreadable cache file {path}: {e}")
+        return None
+
+def save(ticker, interval, history, meta):
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    index = pd.DatetimeIndex(history.index)
+    tz = str(index.tz) if index.tz is not None else None
+    if tz is None:
+        index = index.tz_localize('UTC')
+
+    meta = dict(meta)
+    meta['version'] = CACHE_VERSION
+    meta['tz'] = tz
+
+    arrays = {col.lower(): np.ascontiguousarray(history[col].to_numpy(dtype=np.float64)) for col in OHLCV_COLUMNS}
+    arrays['date'] = index.tz_convert('UTC').tz_localize(None).to_numpy(dtype='datetime64[ns]').astype(np.int64)
+    arrays['meta'] = np.array(json.dumps(meta))
+
+    # write to a temp file first so a crash never leaves a truncated cache behind
+    path = cache_path(ticker, interval)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        np.savez(f, **arrays)
+    os.replace(tmp_path, path)
+
+def touch(ticker, interval, history, meta):
+    meta = dict(meta)
+    meta['fetched_at'] = time.time()
+    save(ticker, interval, history, meta)
+
+def is_fresh(meta, interval='1d', ttl=None):
+    if ttl is None:
+        ttl = ttl_for(interval)
+    return time.time() - meta.get('fetched_at', 0) < ttl
+
+def needs_full_refresh(meta, max_age=FULL_REFRESH_AGE):
+    return time.time() - meta.get('full_fetched_at', 0) > max_age
+
+# checks if bars that were already cached came back with different prices (restated history)
+def is_restated(cached, fetched, rtol=1e-6):
+    common = cached.index.intersection(fetched.index)
+    if len(common) == 0:
+        return False
+    old = cached.loc[common, PRICE_COLUMNS].to_numpy(dtype=np.float64)
+    new = fetched.loc[common, PRICE_COLUMNS].to_numpy(dtype=np.float64)
+    return not np.allclose(old, new, rtol=rtol, equal_nan=True)
+
+# appends freshly fetched bars, newer values win for any overlapping timestamps
+def merge(cached, fetched):
+    merged = pd.concat([cached, fetched[OHLCV_COLUMNS]])
+    merged = merged[~merged.index.duplicated(keep='last')]
+    return merged.sort_index()
+
+def invalidate(ticker, interval=None):
+    if interval is not None:
+        paths = [cache_path(ticker, interval)]
+    else:
+        prefix = os.path.basename(cache_path(ticker, '')).rsplit('_', 1)[0] + '_'
+        paths = []
+        if os.path.isdir(CACHE_DIR):
+            paths = [os.path.join(CACHE_DIR, name) for name in os.listdir(CACHE_DIR) if name.startswith(prefix)]
+    for path in paths:
+        if os.path.exists(path):
+            os.remove(path)
@@ -1,16 +1,22 @@
 import sys
 import pandas as pd
 import numpy as np
-from dateutil.relativedelta import relativedelta
 from sklearn.preprocessing import StandardScaler
 
-from source_SequentialModel import SequentialModel
+from source_TimeSeries import TimeSeries
+from source_Windowing import build_windows, build_direct_windows, make_window_dataset, split_window_indices, n_windows
+from source_ModelRegistry import config_key, data_fingerprint
+from source_Rollout import rollout_forecast
+from source_Telemetry import make_telemetry_callback, make_early_stopping
+from source_Checkpoint import CheckpointStore, TrainingCancelled, make_training_control
+from source_CompiledModel import predict_windows
+from source_Baselines import baseline_forecast
 
 sys.stdout.reconfigure(encoding='utf-8')
 
 # forecast n days into the future using GRU neural net
 # params:
-#   - df - dataframe of time series price data (requires a 'Date' column)
+#   - df - TimeSeries or dataframe of time series price data (requires a 'date' column)
 #   - layers_config - custom neural net layer layout
 #   - target_variable - the variable that will be forecasted (must be included in the data set)
 #   - training_cols - columns used for training the model where the first column is the forecasted variable.
@@ -22,105 +28,220 @@ sys.stdout.reconfigure(encoding='utf-8')
 #   - dropout - percent random dropped neurons in training (value 0.0 to 1.0)
 #   - optimizer - optimizer function for model (see keras documentation)
 #   - loss - loss function for model (see keras documentation)
-#   - past_years_iter - optional paramater to mock forecasting in the past and compare to the actual data
-
-def forecast(df, layers_config, target_variable, training_cols=["open", "high", "low", "close", "volume"], forecast_period=10, epochs=10, step_future=2, step_past=16, dropout=0.2, optimizer='adam', loss='mse', past_years_iter=0):
-    today = df['date'].max()
-    year_iter = past_years_iter
+#   - past_years_iter - optional paramater to forecast from this many years before the last bar (mock forecasting in the past)
+#   - streaming - optional, feed training windows through a tf.data pipeline instead of materializing trainX
+#       * memory then depends on batch_size instead of history length x step_past x features
+#   - batch_size - windows per training batch
+#   - ticker - optional id of the data (ticker and bar size), needed to use the model registry
+#   - registry - optional source_ModelRegistry.ModelRegistry, when set a model trained earlier with the same
+#       config is loaded and fine-tuned only on the windows that are new since it was saved
+#       * a config change, restated data or no saved model falls back to a full training run
+#   - fine_tune_epochs - epochs used when fine-tuning a registry model (defaults to epochs // 5, at least 1)
+#   - forecast_mode - how the forecast_period horizon is produced
+#       * 'window' - predict from the last forecast_period historical windows and shift the level (original behaviour)
+#       * 'rollout' - roll the last window forward feeding every prediction back in (see source_Rollout)
+#       * 'direct' - train on the next forecast_period bars as targets and emit the horizon in one forward pass
+#   - performance_mode - optional, keep the training matrix, scaler output and windows in float32
+#     (off by default, the original float64 path)
+#   - jit_compile - optional, compile fit, predict and the rollout loop with XLA
+#       * helps on gpus, on cpu the fused oneDNN recurrent kernels are usually faster without it
+#   - steps_per_execution - training batches run per compiled call (fewer python round trips per epoch)
+#   - mixed_precision - optional, compute the hidden layers in bfloat16 (see SequentialModel)
+#   * python source_Benchmark.py training reports samples/sec of these settings against the default
+#   - telemetry - optional function called with a stats dict after every training epoch
+#     (loss, val_loss, samples/sec, epoch time, eta, peak memory, see source_Telemetry)
+#   - early_stopping_patience - optional, stop training once val_loss has not improved for this many epochs
+#     and keep the best weights (0 or None trains the full epoch budget)
+#   - cancel - optional threading.Event, setting it stops training at the next batch boundary and
+#     raises source_Checkpoint.TrainingCancelled
+#   - checkpoint_every - optional, checkpoint the model and optimizer state every this many epochs
+#       * running the same config on the same data again resumes from the last checkpoint (see source_Checkpoint)
+#   - checkpoints - optional source_Checkpoint.CheckpointStore (defaults to cache/checkpoints)
+#   - engine - 'neural' (default) trains the layers_config network, the numpy baselines 'naive', 'drift', 'ets',
+#     'ar' and 'linear' return in milliseconds and ignore the training params (see source_Baselines)
+#       * tensorflow is only imported by the neural engine
+
+def forecast(df, layers_config, target_variable, training_cols=["open", "high", "low", "close", "volume"], forecast_period=10, epochs=10, step_future=2, step_past=16, dropout=0.2, optimizer='adam', loss='mse', past_years_iter=0, streaming=False, batch_size=16, ticker=None, registry=None, fine_tune_epochs=None, forecast_mode='window', performance_mode=False, jit_compile=False, steps_per_execution=1, mixed_precision=False, telemetry=None, early_stopping_patience=None, cancel=None, checkpoint_every=None, checkpoints=None, engine='neural'):
+    # df can be a TimeSeries or a frame in the app's layout, either way it is converted only once
+    series = df if isinstance(df, TimeSeries) else TimeSeries.from_frame(df)
+
+    # training data is up until ending_date, past_years_iter years before the last bar
+    # (use source_Backtest.walk_forward to replay several past cutoffs and score them against the actuals)
+    today = series.date_at(-1)
+    ending_date = today.replace(year=today.year - past_years_iter)
+    n_rows = series.index_of(ending_date, side='right')
+
+    return forecast_fold(series, n_rows, layers_config, training_cols=training_cols, forecast_period=forecast_period,
+        epochs=epochs, step_future=step_future, step_past=step_past, dropout=dropout, optimizer=optimizer, loss=loss,
+        streaming=streaming, batch_size=batch_size, ticker=ticker, registry=registry, fine_tune_epochs=fine_tune_epochs, forecast_mode=forecast_mode,
+        performance_mode=performance_mode, jit_compile=jit_compile, steps_per_execution=steps_per_execution, mixed_precision=mixed_precision,
+        telemetry=telemetry, early_stopping_patience=early_stopping_patience, cancel=cancel, checkpoint_every=checkpoint_every, checkpoints=checkpoints, engine=engine)
+
+# trains on the first n_rows rows of a TimeSeries and forecasts forward from row n_rows - 1
+# (same params as forecast, the training range is a view of the series so nothing is copied)
+def forecast_fold(series, n_rows, layers_config, training_cols=["open", "high", "low", "close", "volume"], forecast_period=10, epochs=10, step_future=2, step_past=16, dropout=0.2, optimizer='adam', loss='mse', streaming=False, batch_size=16, ticker=None, registry=None, fine_tune_epochs=None, forecast_mode='window', performance_mode=False, jit_compile=False, steps_per_execution=1, mixed_precision=False, telemetry=None, early_stopping_patience=None, cancel=None, checkpoint_every=None, checkpoints=None, engine='neural'):
     forecast_variable = training_cols[0]
-
-    for i in range(year_iter, -1, -1):
-        df2 = df.copy()
-        ending_date = today.replace(year=today.year - i)
-        df2 = df2.loc[df2['date'] <= ending_date]  # Training dataset is up until ending_date
-        train_dates = pd.to_datetime(df2['date'])
-
-        cols = training_cols
-
-        # Using this df for training
-        df_for_training = df2[cols].astype(float)
-
-        # Scaling
+    last_train_date = series.date_at(n_rows - 1)
+
+    cols = training_cols
+
+    # Using this data for training
+    # (the price columns are float32 already, performance mode keeps them that way, the scaler preserves the dtype)
+    dtype = np.float32 if performance_mode else float
+    df_for_training = series.matrix(cols, dtype=dtype, stop=n_rows)
+
+    n_future = step_future
+    n_past = step_past
+
+    # the numpy baselines need none of the network training below
+    if engine != 'neural':
+        predicted = baseline_forecast(engine, df_for_training, forecast_period - 1, n_past=n_past)
+        values = np.concatenate(([df_for_training[-1, 0]], predicted))[:forecast_period]
+        return forecast_frame(last_train_date, forecast_variable, values)
+
+    # direct mode trains on the next horizon bars at once, the other modes on one bar step_future ahead
+    direct = forecast_mode == 'direct'
+    horizon = max(forecast_period - 1, 1) if direct else None
+    target_span = horizon if direct else n_future
+
+    hyperparams = {
+        'training_cols': training_cols,
+        'epochs': epochs,
+        'step_future': step_future,
+        'step_past': step_past,
+        'dropout': dropout,
+        'optimizer': optimizer,
+        'loss': loss,
+        'batch_size': batch_size,
+        'horizon': horizon,
+        # precision settings change the trained weights, so a float32 / bfloat16 model is never reused by a float64 run
+        'performance_mode': bool(performance_mode),
+        'mixed_precision': bool(mixed_precision)
+    }
+
+    # a registry model trained on an unchanged prefix of this data is reused with its scaler
+    registry_key = None
+    saved = None
+    if registry is not None and ticker is not None:
+        registry_key = config_key(ticker, layers_config, hyperparams)
+        saved = registry.load(registry_key)
+        if saved is not None:
+            trained_rows = saved[2]['n_rows']
+            if trained_rows > n_rows or data_fingerprint(df_for_training, trained_rows) != saved[2]['fingerprint']:
+                saved = None  # data was restated (or is shorter), retrain from scratch
+
+    # Scaling
+    if saved is not None:
+        model, scaler, meta = saved
+    else:
         scaler = StandardScaler()
         scaler = scaler.fit(df_for_training)
-        df_for_training_scaled = scaler.transform(df_for_training)
-
-        trainX = []
-        trainY = []
-
-        n_future = step_future
-        n_past = step_past
-
-        for i in range(n_past, len(df_for_training_scaled) - n_future + 1):
-            trainX.append(df_for_training_scaled[i - n_past:i, 0:df_for_training.shape[1]])
-            trainY.append(df_for_training_scaled[i + n_future - 1:i + n_future, 0])
-
-        trainX, trainY = np.array(trainX), np.array(trainY)
-
-        m = SequentialModel(input_shape=(trainX.shape[1], trainX.shape[2]), output_shape=trainY.shape[1], layers_config=layers_config, dropout=dropout, optimizer=optimizer, loss=loss)
+    df_for_training_scaled = scaler.transform(df_for_training)
+
+    # windows are strided views over the scaled array (no per sample copies)
+    if direct:
+        trainX, trainY = build_direct_windows(df_for_training_scaled, n_past, horizon)
+    else:
+        trainX, trainY = build_windows(df_for_training_scaled, n_past, n_future)
+
+    # per epoch stats go to telemetry, early stopping needs validation data so it is not used when fine-tuning
+    # the cancel / checkpoint control goes first so it sees a cut short epoch before the others
+    def fit_callbacks(n_samples, validated, control):
+        callbacks = [control]
+        if telemetry is not None:
+            callbacks.append(make_telemetry_callback(telemetry, n_samples))
+        if early_stopping_patience and validated:
+            callbacks.append(make_early_stopping(early_stopping_patience))
+        return callbacks
+
+    trained = True
+    if saved is not None:
+        # only windows whose target bar is new since the model was saved
+        first_new = max(0, n_windows(meta['n_rows'], n_past, target_span))
+        trained = first_new < len(trainX)
+        if trained:
+            if fine_tune_epochs is None:
+                fine_tune_epochs = max(1, epochs // 5)
+            control = make_training_control(cancel)
+            history = model.fit(trainX[first_new:], trainY[first_new:], epochs=fine_tune_epochs, batch_size=batch_size,
+                callbacks=fit_callbacks(len(trainX) - first_new, False, control), verbose=1)
+            if control.cancelled:
+                raise TrainingCancelled(control.epochs_done)
+    else:
+        from source_SequentialModel import SequentialModel
+        m = SequentialModel(input_shape=(trainX.shape[1], trainX.shape[2]), output_shape=trainY.shape[1], layers_config=layers_config, dropout=dropout, optimizer=optimizer, loss=loss,
+            jit_compile=True if jit_compile else 'auto', steps_per_execution=steps_per_execution, mixed_precision=mixed_precision)
         model = m.get_model()
 
-        # history object contains information about the training process like loss and validation loss (unused right now)
-        history = model.fit(trainX, trainY, epochs=epochs, batch_size=16, validation_split=0.1, verbose=1)
-
-        # Forecast period
-        forecast_future = forecast_period
-        forecast_period_dates = pd.date_range(list(train_dates)[-1], periods=forecast_future, freq='1d').tolist()
-        forecast = model.predict(trainX[-forecast_future:])
-
-        # Unscale forecasted data
-        forecast_copies = np.repeat(forecast, df_for_training.shape[1], axis=-1)
-        y_pred_future = scaler.inverse_transform(forecast_copies)[:, 0]
-
-        # Prepare forecasted dates
-        forecast_dates = [time_i.date() for time_i in forecast_period_dates]
-        df_forecast = pd.DataFrame({'date': forecast_dates, forecast_variable: y_pred_future})
-        df_forecast['date'] = pd.to_datetime(df_forecast['date']).dt.date
-        # df_forecast['date'] = pd.to_datetime(df_forecast['date'])
-        last_forecast_date = df_forecast['date'].max()
-
-        # Actual Data
-        df_actual = df.copy()
-        df_actual.reset_index(inplace=True)
-        df_actual['date'] = pd.to_datetime(df['date'])
-
-        # Prepare training data
-        training = df2[['date', forecast_variable]].copy()
-        training['date'] = pd.to_datetime(training['date'])
-        # Subtract 6 months from the ending date
-        nine_months_ago = pd.to_datetime(ending_date) - relativedelta(months=9)
-        # Filter training data
-        training = training.loc[training['date'] >= nine_months_ago]
-        last_training_date = training['date'].iloc[-1]
-
-        # Fixing forecast offset
-        last_training_price = training[forecast_variable].iloc[-1]
-        first_forecast_price = df_forecast[forecast_variable].iloc[0]
-        offset = last_training_price - first_forecast_price
-        i = 0
-        for price in df_forecast[forecast_variable]:
-            df_forecast[forecast_variable].iloc[i] = price + offset
-            i += 1
-
-
-        return df_forecast
-
-        # # Prepare actual data for comparison
-        # actual = df_actual[['date', forecast_variable]]
-        # actual['date'] = pd.to_datetime(actual['date'])
-        # actual = actual.loc[actual['date'] >= last_training_date]  # Start from the day after the last date in 'original'
-        # actual = actual.loc[actual['date'] <= last_forecast_date]
-
-
-        # fig = go.Figure()
-        # fig.add_trace(go.Scatter(x=training['date'], y=training[forecast_variable], mode='lines', name='Historical'))
-        # fig.add_trace(go.Scatter(x=df_forecast['date'], y=df_forecast[forecast_variable], mode='lines', name='Forecasted'))
-        # fig.add_trace(go.Scatter(x=actual['date'], y=actual[forecast_variable], mode='lines', name='Actual'))
-        # fig.update_layout(
-        #     title='Stock Data and Forecast: ' + last_training_date.strftime('%Y-%m-%d'),
-        #     xaxis_title='Date',
-        #     yaxis_title=forecast_variable,
-        #     hovermode='x unified'  # Enable hover on the same x-axis
-        # )
-
-        # fig.show()
+        # a checkpoint of this exact run (config and training rows) is resumed with its optimizer state
+        checkpoint_key = None
+        initial_epoch = 0
+        if checkpoint_every:
+            if checkpoints is None:
+                checkpoints = CheckpointStore()
+            checkpoint_key = config_key(ticker, layers_config, dict(hyperparams, n_rows=n_rows,
+                fingerprint=data_fingerprint(df_for_training)))
+            resumed = checkpoints.load(checkpoint_key)
+            if resumed is not None:
+                model, initial_epoch = resumed
+                print(f"resuming training from the checkpoint after epoch {initial_epoch}")
+
+        control = make_training_control(cancel, checkpoints, checkpoint_key, checkpoint_every)
+        train_idx, val_idx = split_window_indices(len(trainX), validation_split=0.1)
+        callbacks = fit_callbacks(len(train_idx), len(val_idx) > 0, control)
+        if streaming:
+            train_ds = make_window_dataset(df_for_training_scaled, n_past, n_future, train_idx, batch_size=batch_size, shuffle=True, horizon=horizon)
+            val_ds = make_window_dataset(df_for_training_scaled, n_past, n_future, val_idx, batch_size=batch_size, horizon=horizon)
+            history = model.fit(train_ds, validation_data=val_ds, epochs=epochs, initial_epoch=initial_epoch, shuffle=False, callbacks=callbacks, verbose=1)  # the dataset shuffles itself
+        else:
+            history = model.fit(trainX, trainY, epochs=epochs, initial_epoch=initial_epoch, batch_size=batch_size, validation_split=0.1, callbacks=callbacks, verbose=1)
+
+        if control.cancelled:
+            if checkpoint_key is not None:
+                checkpoints.save(checkpoint_key, model, control.epochs_done)
+            raise TrainingCancelled(control.epochs_done)
+        if checkpoint_key is not None:
+            checkpoints.remove(checkpoint_key)
+
+    if registry_key is not None and trained:
+        registry.save(registry_key, model, scaler, {
+            'ticker': ticker,
+            'n_rows': n_rows,
+            'last_date': last_train_date,
+            'fingerprint': data_fingerprint(df_for_training),
+            'layers_config': layers_config,
+            'hyperparams': hyperparams,
+            'forecast_mode': forecast_mode
+        })
+
+    # Forecast period
+    forecast_future = forecast_period
+    if forecast_mode == 'rollout':
+        # first point is the last training bar itself, the rest is rolled forward from the last window
+        rolled = rollout_forecast(model, df_for_training_scaled, n_past, n_future, max(forecast_future - 1, 1), jit_compile=jit_compile)[0]
+        forecast = np.concatenate(([df_for_training_scaled[-1, 0]], rolled))[:forecast_future, None]
+    elif direct:
+        # one forward pass emits the whole horizon from the last window
+        direct_forecast = predict_windows(model, df_for_training_scaled[None, -n_past:])[0]
+        forecast = np.concatenate(([df_for_training_scaled[-1, 0]], direct_forecast))[:forecast_future, None]
+    elif forecast_mode == 'window':
+        forecast = predict_windows(model, trainX[-forecast_future:])
+    else:
+        raise ValueError(f"Unsupported forecast mode: {forecast_mode}")
+
+    # Unscale forecasted data
+    forecast_copies = np.repeat(forecast, df_for_training.shape[1], axis=-1)
+    y_pred_future = scaler.inverse_transform(forecast_copies)[:, 0]
+
+    # Fixing forecast offset so the forecast starts at the last training price
+    last_training_price = series.column(forecast_variable)[n_rows - 1]
+    offset = last_training_price - y_pred_future[0]
+    y_pred_future = y_pred_future + offset
+
+    return forecast_frame(last_train_date, forecast_variable, y_pred_future)
+
+# forecast result frame, the first value is the last training bar and every next one is a day later
+def forecast_frame(last_train_date, forecast_variable, values):
+    forecast_period_dates = pd.date_range(pd.Timestamp(last_train_date), periods=len(values), freq='1d').tolist()
+    forecast_dates = [time_i.date() for time_i in forecast_period_dates]
+    return pd.DataFrame({'date': forecast_dates, forecast_variable: values})
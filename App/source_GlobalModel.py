@@ -0,0 +1,118 @@
+import numpy as np
+import pandas as pd
+from sklearn.preprocessing import StandardScaler
+
+from source_TimeSeries import TimeSeries
+from source_Windowing import build_direct_windows, split_window_indices
+
+# GLOBAL MULTI-TICKER MODEL
+#
+# one SequentialModel is trained on windows pooled from every ticker instead of one model per ticker
+#   - each ticker is scaled with its own StandardScaler so prices of different magnitude share one model
+#   - the model uses direct multi-horizon targets (see build_direct_windows), so the horizon of every ticker
+#     comes out of a single batched predict call
+#   - optionally a learned ticker embedding is repeated along the window and concatenated to the features,
+#     letting the shared model tell the tickers apart
+
+
+def build_global_model(n_tickers, input_shape, horizon, layers_config, dropout=0.2, optimizer='adam', loss='mse', ticker_embedding=0):
+    from source_SequentialModel import SequentialModel
+
+    if ticker_embedding <= 0:
+        m = SequentialModel(input_shape=input_shape, output_shape=horizon, layers_config=layers_config, dropout=dropout, optimizer=optimizer, loss=loss)
+        return m.get_model()
+
+    from tensorflow.keras.layers import Input, Embedding, RepeatVector, Concatenate # type: ignore
+    from tensorflow.keras.models import Model # type: ignore
+
+    n_past, n_features = input_shape
+    window_in = Input(shape=(n_past, n_features), name='window')
+    ticker_in = Input(shape=(), dtype='int32', name='ticker')
+    embedded = RepeatVector(n_past)(Embedding(n_tickers, ticker_embedding)(ticker_in))
+    features = Concatenate(axis=-1)([window_in, embedded])
+
+    body = SequentialModel(input_shape=(n_past, n_features + ticker_embedding), output_shape=horizon,
+        layers_config=layers_config, dropout=dropout, optimizer=optimizer, loss=loss).get_model()
+    model = Model(inputs=[window_in, ticker_in], outputs=body(features))
+    model.compile(optimizer=optimizer, loss=loss)
+    return model
+
+# params:
+#   - frames - dict of ticker -> TimeSeries or dataframe (requires a 'date' column)
+#   - layers_config, training_cols, forecast_period, epochs, step_past, dropout, optimizer, loss, batch_size
+#       - same as source_Forecast.forecast
+#   - ticker_embedding - size of the learned ticker embedding, 0 trains without one
+# returns (forecasts, errors)
+#   - forecasts - dict of ticker -> frame with 'date' and the forecasted variable, same layout as forecast()
+#   - errors - dict of ticker -> source_Misc.TickerError for tickers that could not be used (too little data)
+def forecast_many(frames, layers_config, training_cols=["open", "high", "low", "close", "volume"], forecast_period=10, epochs=10, step_past=16, dropout=0.2, optimizer='adam', loss='mse', batch_size=64, ticker_embedding=0):
+    from source_Misc import TickerError
+
+    forecast_variable = training_cols[0]
+    horizon = max(forecast_period - 1, 1)
+
+    tickers = []
+    series_list = []
+    scalers = []
+    scaled_list = []
+    train_parts = ([], [], [])
+    val_parts = ([], [], [])
+    errors = {}
+
+    for ticker, df in frames.items():
+        try:
+            series = df if isinstance(df, TimeSeries) else TimeSeries.from_frame(df)
+            training_data = series.matrix(training_cols, dtype=float)
+            scaler = StandardScaler().fit(training_data)
+            scaled = scaler.transform(training_data)
+            trainX, trainY = build_direct_windows(scaled, step_past, horizon)
+        except Exception as e:
+            errors[ticker] = TickerError(ticker, e, 1)
+            continue
+
+        ticker_id = len(tickers)
+        tickers.append(ticker)
+        series_list.append(series)
+        scalers.append(scaler)
+        scaled_list.append(scaled)
+
+        # hold out the last 10% of every ticker, not the last 10% of the pooled set
+        train_idx, _ = split_window_indices(len(trainX), validation_split=0.1)
+        split_at = len(train_idx)
+        for parts, x, y in ((train_parts, trainX[:split_at], trainY[:split_at]), (val_parts, trainX[split_at:], trainY[split_at:])):
+            parts[0].append(x)
+            parts[1].append(y)
+            parts[2].append(np.full(len(x), ticker_id, dtype=np.int32))
+
+    if not tickers:
+        return {}, errors
+
+    trainX, trainY, train_ids = (np.concatenate(part) for part in train_parts)
+    valX, valY, val_ids = (np.concatenate(part) for part in val_parts)
+
+    model = build_global_model(len(tickers), (trainX.shape[1], trainX.shape[2]), horizon, layers_config,
+        dropout=dropout, optimizer=optimizer, loss=loss, ticker_embedding=ticker_embedding)
+
+    if ticker_embedding > 0:
+        train_inputs, val_inputs = [trainX, train_ids], [valX, val_ids]
+    else:
+        train_inputs, val_inputs = trainX, valX
+    validation_data = (val_inputs, valY) if len(valY) > 0 else None
+    model.fit(train_inputs, trainY, epochs=epochs, batch_size=batch_size, validation_data=validation_data, shuffle=True, verbose=1)
+
+    # the last window of every ticker, predicted in one batch
+    last_windows = np.stack([scaled[-step_past:] for scaled in scaled_list])
+    ticker_ids = np.arange(len(tickers), dtype=np.int32)
+    predicted = model.predict([last_windows, ticker_ids] if ticker_embedding > 0 else last_windows, batch_size=max(len(tickers), 1))
+
+    forecasts = {}
+    for i, ticker in enumerate(tickers):
+        scaler = scalers[i]
+        series = series_list[i]
+        # only column 0 is forecasted, unscale it with that ticker's own mean and scale
+        y_pred_future = predicted[i, :forecast_period - 1] * scaler.scale_[0] + scaler.mean_[0]
+        y_pred_future = np.concatenate(([series.column(forecast_variable)[-1]], y_pred_future))
+
+        forecast_period_dates = pd.date_range(pd.Timestamp(series.date_at(-1)), periods=len(y_pred_future), freq='1d')
+        forecasts[ticker] = pd.DataFrame({'date': [time_i.date() for time_i in forecast_period_dates], forecast_variable: y_pred_future})
+    return forecasts, errors
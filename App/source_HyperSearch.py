@@ -0,0 +1,214 @@
+import os
+import json
+import time
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import numpy as np
+import pandas as pd
+from sklearn.preprocessing import StandardScaler
+
+from source_TimeSeries import TimeSeries
+from source_Windowing import build_windows, split_window_indices
+
+# HYPERPARAMETER SEARCH OVER THE CREATE MODEL PARAMETERS
+#
+# the search space uses the same knobs as CreateModelWindow, every entry is one of:
+#   - (low, high) ints - any int in [low, high]
+#   - (low, high) floats - uniform in [low, high]
+#   - list - one of the listed values
+# neurons and layer_type are drawn per layer
+# trials run in a spawn process pool, each worker gets threads_per_trial tensorflow threads
+# trials can use different loss functions, so they are compared on the mean squared error of the validation windows
+# after every epoch a trial reports its val_mse to a list shared by all workers, and a trial whose val_mse
+# is worse than the median of the other trials at the same epoch is pruned (after warmup_epochs)
+# the leaderboard is written to json after every finished trial, rerunning with the same file resumes the search
+
+DEFAULT_SPACE = {
+    'n_layers': (1, 3),
+    'neurons': [16, 32, 64, 128],
+    'layer_type': ['LSTM', 'GRU', 'SimpleRNN', 'Dense'],
+    'dropout': (0.0, 0.5),
+    'optimizer': ['adam', 'rmsprop', 'nadam'],
+    'loss': ['mean_squared_error', 'mean_absolute_error', 'huber'],
+}
+
+SEQUENCE_TYPES = ['LSTM', 'GRU', 'SimpleRNN', 'Conv1D', 'Attention']
+
+_worker = {}
+
+
+def _draw(rng, spec):
+    if isinstance(spec, list):
+        return spec[rng.integers(len(spec))]
+    low, high = spec
+    if isinstance(low, int) and isinstance(high, int):
+        return int(rng.integers(low, high + 1))
+    return float(rng.uniform(low, high))
+
+# trial number -> params, seeded by (seed, trial) so a resumed search draws the same trials again
+def sample_params(space, trial, seed=0):
+    rng = np.random.default_rng([seed, trial])
+    n_layers = _draw(rng, space['n_layers'])
+    return {
+        'n_layers': n_layers,
+        'neurons': [int(_draw(rng, space['neurons'])) for _ in range(n_layers)],
+        'layer_type': [str(_draw(rng, space['layer_type'])) for _ in range(n_layers)],
+        'dropout': round(_draw(rng, space['dropout']), 4),
+        'optimizer': str(_draw(rng, space['optimizer'])),
+        'loss': str(_draw(rng, space['loss'])),
+    }
+
+# a sequence layer returns sequences when any later layer is a sequence layer too (Dense in between keeps the time
+# axis, e.g. [LSTM, Dense, LSTM]), a stack that never collapses the time axis is flattened by SequentialModel
+def params_to_layers_config(params):
+    import source_Misc as mc
+    types = params['layer_type']
+    return_list = [types[i] in SEQUENCE_TYPES and any(t in SEQUENCE_TYPES for t in types[i + 1:]) for i in range(len(types))]
+    return mc.create_layer_config(params['n_layers'], params['neurons'], types, return_list)
+
+
+def _init_worker(scaled, n_past, n_future, batch_size, threads_per_trial, reports, warmup_epochs, min_reports):
+    import tensorflow as tf
+    tf.config.threading.set_intra_op_parallelism_threads(threads_per_trial)
+    tf.config.threading.set_inter_op_parallelism_threads(1)
+
+    trainX, trainY = build_windows(scaled, n_past, n_future)
+    train_idx, _ = split_window_indices(len(trainX), validation_split=0.1)
+    split_at = len(train_idx)
+    _worker.update({
+        'train': (trainX[:split_at], trainY[:split_at]),
+        'val': (trainX[split_at:], trainY[split_at:]),
+        'batch_size': batch_size,
+        'reports': reports,
+        'warmup_epochs': warmup_epochs,
+        'min_reports': min_reports,
+    })
+
+def _make_pruning_callback(trial):
+    from tensorflow.keras.callbacks import Callback # type: ignore
+
+    class MedianPruning(Callback):
+        def __init__(self):
+            super().__init__()
+            self.pruned = False
+            self.curve = []
+
+        def on_epoch_end(self, epoch, logs=None):
+            valX, valY = _worker['val']
+            predicted = self.model.predict(valX, batch_size=256, verbose=0).reshape(valY.shape)
+            val_mse = float(np.mean((predicted - valY) ** 2))
+            self.curve.append(val_mse)
+            reports = _worker['reports']
+            others = [value for (t, e, value) in list(reports) if e == epoch and t != trial]
+            reports.append((trial, epoch, val_mse))
+            if epoch + 1 < _worker['warmup_epochs'] or len(others) < _worker['min_reports']:
+                return
+            if epoch + 1 >= self.params.get('epochs', 0):
+                return  # nothing left to save on the last epoch
+            if not np.isfinite(val_mse) or val_mse > np.median(others):
+                self.pruned = True
+                self.model.stop_training = True
+
+    return MedianPruning()
+
+def _run_trial(trial, params, epochs):
+    from source_SequentialModel import SequentialModel
+
+    start = time.perf_counter()
+    trainX, trainY = _worker['train']
+    m = SequentialModel(input_shape=(trainX.shape[1], trainX.shape[2]), output_shape=trainY.shape[1],
+        layers_config=params_to_layers_config(params), dropout=params['dropout'], optimizer=params['optimizer'], loss=params['loss'])
+    model = m.get_model()
+    pruning = _make_pruning_callback(trial)
+    model.fit(trainX, trainY, epochs=epochs, batch_size=_worker['batch_size'],
+        callbacks=[pruning], verbose=0)
+
+    finite = [value for value in pruning.curve if np.isfinite(value)]
+    return {
+        'trial': trial,
+        'params': params,
+        'status': 'pruned' if pruning.pruned else 'complete',
+        'val_mse': min(finite) if finite else None,
+        'epochs_run': len(pruning.curve),
+        'curve': pruning.curve,
+        'seconds': time.perf_counter() - start,
+    }
+
+
+def load_leaderboard(path):
+    if path is None or not os.path.exists(path):
+        return None
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def save_leaderboard(path, board):
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(board, f, indent=4)
+    os.replace(tmp_path, path)
+
+def leaderboard_frame(board):
+    rows = []
+    for result in board['trials']:
+        row = {key: result.get(key) for key in ('trial', 'status', 'val_mse', 'epochs_run', 'seconds')}
+        row.update(result['params'])
+        rows.append(row)
+    df = pd.DataFrame(rows)
+    if not df.empty:
+        df = df.sort_values(['val_mse', 'trial'], na_position='last').reset_index(drop=True)
+    return df
+
+# params:
+#   - df - TimeSeries or dataframe of time series price data (requires a 'date' column)
+#   - space - search space (see DEFAULT_SPACE)
+#   - n_trials - total trials in the search (a resumed search only runs the missing ones)
+#   - training_cols, epochs, step_future, step_past, batch_size - same as source_Forecast.forecast
+#   - leaderboard_path - json file the results are written to and resumed from
+#   - max_workers - trials trained at the same time
+#   - cpu_threads - total tensorflow threads shared by the workers (defaults to every core)
+#   - warmup_epochs - epochs every trial runs before it can be pruned
+#   - min_reports - other trials that must have reported an epoch before it is used for pruning
+#   - seed - seed of the trial sampler
+# returns the leaderboard as a frame sorted by best val_mse
+def run_search(df, space=None, n_trials=20, training_cols=["open", "high", "low", "close", "volume"], epochs=10, step_future=2, step_past=16, batch_size=16, leaderboard_path=None, max_workers=None, cpu_threads=None, warmup_epochs=2, min_reports=2, seed=0):
+    series = df if isinstance(df, TimeSeries) else TimeSeries.from_frame(df)
+    if space is None:
+        space = DEFAULT_SPACE
+
+    board = load_leaderboard(leaderboard_path)
+    if board is None or board.get('space') != json.loads(json.dumps(space)) or board.get('seed') != seed:
+        board = {'space': space, 'seed': seed, 'trials': []}
+    done = {result['trial'] for result in board['trials']}
+    pending = [trial for trial in range(n_trials) if trial not in done]
+
+    if pending:
+        training_data = series.matrix(training_cols, dtype=float)
+        scaled = StandardScaler().fit_transform(training_data)
+
+        cores = os.cpu_count() or 1
+        if cpu_threads is None:
+            cpu_threads = cores
+        if max_workers is None:
+            max_workers = max(1, min(cores // 2, len(pending)))
+        threads_per_trial = max(1, cpu_threads // max_workers)
+
+        context = multiprocessing.get_context('spawn')
+        with context.Manager() as manager:
+            # finished trials from an earlier run still count as references for pruning
+            reports = manager.list([(result['trial'], epoch, value)
+                for result in board['trials'] for epoch, value in enumerate(result.get('curve', []))])
+            with ProcessPoolExecutor(max_workers=max_workers, mp_context=context, initializer=_init_worker,
+                    initargs=(scaled, step_past, step_future, batch_size, threads_per_trial, reports, warmup_epochs, min_reports)) as executor:
+                futures = {executor.submit(_run_trial, trial, sample_params(space, trial, seed), epochs): trial for trial in pending}
+                for future in as_completed(futures):
+                    trial = futures[future]
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        result = {'trial': trial, 'params': sample_params(space, trial, seed), 'status': 'failed',
+                            'val_mse': None, 'epochs_run': 0, 'curve': [], 'seconds': None, 'error': str(e)}
+                    board['trials'].append(result)
+                    if leaderboard_path is not None:
+                        save_leaderboard(leaderboard_path, board)
+
+    return leaderboard_frame(board)
@@ -0,0 +1,307 @@
+import os
+import sys
+import json
+import time
+import queue
+import argparse
+import threading
+from collections import deque
+from concurrent.futures import Future
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+import numpy as np
+
+from source_ModelRegistry import ModelRegistry
+
+# LOCAL FORECAST INFERENCE SERVICE
+#
+# a long running http service on localhost that keeps trained registry models (see source_ModelRegistry) in memory
+#   - POST /forecast {"key": registry key, "window": [[row], ...], "horizon": optional int}
+#       * window - the latest unscaled rows of the model's training_cols (at least step_past rows, the last ones are used)
+#       * direct models return their whole horizon, the other models return the one value step_future bars
+#         after the window, or roll forward horizon bars when horizon is given (see source_Rollout)
+#       * returns {"forecast": [values of the forecasted variable], "latency_ms": ...}
+#   - GET /stats - request count, latency percentiles and the mean size of the predict batches
+#   - GET /models - loaded models (with the drift report of their compiled export) and every key in the registry
+# concurrent requests for the same model (and horizon) are grouped by a MicroBatcher into one predict call:
+# a batch is run when it has max_batch windows or max_wait seconds after its first request arrived
+# with compiled set the single step forecasts run on the tflite export of the model (see source_CompiledModel),
+# it is exported on first use when the registry entry has none yet (rollouts keep using the keras model)
+#
+# run from the App folder:
+#     python source_InferenceService.py --port 8765 --max-batch 64 --max-wait-ms 5
+#     python source_InferenceService.py --compiled float16
+
+
+class MicroBatcher:
+
+    def __init__(self, predict_fn, max_batch=32, max_wait=0.005, on_batch=None):
+        """
+        Groups single requests into batched predict calls on a background thread.
+
+        Parameters:
+        - predict_fn: Function (batch array) -> array with one result row per batch row.
+        - max_batch: Integer, most requests in one predict call.
+        - max_wait: Float, seconds a batch waits for more requests after its first one arrived.
+        - on_batch: Optional function called with the size of every batch that was run.
+        """
+        self.predict_fn = predict_fn
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.on_batch = on_batch
+        self.requests = queue.Queue()
+        self.thread = threading.Thread(target=self._loop, daemon=True)
+        self.thread.start()
+
+    def submit(self, x):
+        """
+        Queues one input and returns a concurrent.futures.Future of its result row.
+        """
+        future = Future()
+        self.requests.put((x, future))
+        return future
+
+    def _loop(self):
+        while True:
+            batch = [self.requests.get()]
+            deadline = time.perf_counter() + self.max_wait
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self.requests.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+            try:
+                results = self.predict_fn(np.stack([x for x, _ in batch]))
+                for (_, future), result in zip(batch, results):
+                    future.set_result(result)
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+            if self.on_batch is not None:
+                self.on_batch(len(batch))
+
+
+class LatencyStats:
+
+    def __init__(self, window=10_000):
+        """
+        Latencies of the last `window` requests and the sizes of the last `window` batches.
+        """
+        self.latencies = deque(maxlen=window)
+        self.batch_sizes = deque(maxlen=window)
+        self.count = 0
+        self.lock = threading.Lock()
+
+    def add_latency(self, seconds):
+        with self.lock:
+            self.latencies.append(seconds)
+            self.count += 1
+
+    def add_batch(self, size):
+        with self.lock:
+            self.batch_sizes.append(size)
+
+    def summary(self):
+        with self.lock:
+            latencies = np.array(self.latencies, dtype=float) * 1e3
+            batch_sizes = np.array(self.batch_sizes, dtype=float)
+            count = self.count
+        summary = {'requests': count, 'batches': len(batch_sizes),
+                   'mean_batch_size': float(batch_sizes.mean()) if len(batch_sizes) else None}
+        for p in (50, 90, 99):
+            summary[f'p{p}_ms'] = float(np.percentile(latencies, p)) if len(latencies) else None
+        summary['max_ms'] = float(latencies.max()) if len(latencies) else None
+        return summary
+
+
+class ModelServer:
+
+    def __init__(self, registry=None, max_batch=32, max_wait=0.005, compiled=None):
+        """
+        Keeps registry models loaded and serves batched forecasts from them.
+
+        Parameters:
+        - registry: source_ModelRegistry.ModelRegistry the models are loaded from (default: cache/models).
+        - max_batch, max_wait: MicroBatcher settings of every model.
+        - compiled: Optional quantization (source_CompiledModel.QUANTIZATIONS) of the tflite export to serve.
+        """
+        self.registry = registry if registry is not None else ModelRegistry()
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.compiled = compiled
+        self.stats = LatencyStats()
+        self.models = {}  # key -> loaded entry dict
+        self.batchers = {}  # (key, horizon) -> MicroBatcher
+        self.lock = threading.Lock()
+
+    def load(self, key):
+        """
+        Returns the loaded entry of a registry key (loading it on first use).
+        """
+        with self.lock:
+            if key in self.models:
+                return self.models[key]
+            saved = self.registry.load(key)
+            if saved is None:
+                raise KeyError(f"No model in the registry for key {key}.")
+            model, scaler, meta = saved
+            if 'hyperparams' not in meta:
+                raise ValueError(f"Registry entry {key} was saved without its hyperparams, forecast it once more to update it.")
+            hyperparams = meta['hyperparams']
+
+            import tensorflow as tf
+            entry = {
+                'model': model,
+                'scaler': scaler,
+                'meta': meta,
+                'n_past': hyperparams['step_past'],
+                'n_future': hyperparams['step_future'],
+                'horizon': hyperparams.get('horizon'),
+                'n_features': len(hyperparams['training_cols']),
+                'predict': tf.function(lambda x: model(x, training=False), reduce_retracing=True)
+            }
+            if self.compiled is not None:
+                import source_CompiledModel as cm
+                exported = cm.load_registry_entry(self.registry, key, self.compiled)
+                if exported is None:
+                    exported = cm.export_registry_entry(self.registry, key, self.compiled)
+                entry['compiled'], entry['drift'] = exported
+            self.models[key] = entry
+            return entry
+
+    def _batcher(self, key, horizon):
+        entry = self.load(key)
+        with self.lock:
+            if (key, horizon) not in self.batchers:
+                if horizon is None and 'compiled' in entry:
+                    predict_fn = lambda windows: entry['compiled'].predict(windows).astype(float)
+                elif horizon is None:
+                    predict_fn = lambda windows: np.asarray(entry['predict'](windows.astype(np.float32)), dtype=float)
+                else:
+                    from source_Rollout import get_rollout_fn
+                    rollout = get_rollout_fn(entry['model'], horizon, entry['n_future'])
+                    predict_fn = lambda windows: rollout(windows.astype(np.float32)).numpy().astype(float)
+                self.batchers[(key, horizon)] = MicroBatcher(predict_fn, self.max_batch, self.max_wait, on_batch=self.stats.add_batch)
+            return self.batchers[(key, horizon)]
+
+    def forecast(self, key, window, horizon=None, timeout=30.0):
+        """
+        Forecast of one window of unscaled rows, returns a list of unscaled values of the forecasted variable.
+        """
+        start = time.perf_counter()
+        entry = self.load(key)
+        window = np.asarray(window, dtype=float)
+        if window.ndim != 2 or window.shape[1] != entry['n_features'] or len(window) < entry['n_past']:
+            raise ValueError(
+                f"`window` must have at least {entry['n_past']} rows of {entry['n_features']} columns, "
+                f"but got shape {window.shape}."
+            )
+        if entry['horizon'] is not None:
+            horizon = None  # direct models always emit their trained horizon
+
+        scaler = entry['scaler']
+        scaled = scaler.transform(window[-entry['n_past']:])
+        result = self._batcher(key, horizon).submit(scaled).result(timeout=timeout)
+        # only column 0 is forecasted, unscale it with its own mean and scale
+        values = np.atleast_1d(result) * scaler.scale_[0] + scaler.mean_[0]
+        self.stats.add_latency(time.perf_counter() - start)
+        return values.tolist()
+
+    def warm_up(self, key):
+        """
+        Loads a model and traces its predict function so the first real request is fast.
+        """
+        entry = self.load(key)
+        self.forecast(key, np.tile(entry['scaler'].mean_, (entry['n_past'], 1)))
+
+
+def make_handler(server):
+
+    class ForecastHandler(BaseHTTPRequestHandler):
+
+        def _reply(self, status, body):
+            data = json.dumps(body).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            if self.path == '/stats':
+                self._reply(200, server.stats.summary())
+            elif self.path == '/models':
+                keys = []
+                if os.path.isdir(server.registry.root):
+                    keys = sorted(os.listdir(server.registry.root))
+                loaded = {key: entry.get('drift') for key, entry in list(server.models.items())}
+                self._reply(200, {'loaded': loaded, 'registry': keys})
+            else:
+                self._reply(404, {'error': f"Unknown path {self.path}."})
+
+        def do_POST(self):
+            if self.path != '/forecast':
+                self._reply(404, {'error': f"Unknown path {self.path}."})
+                return
+            start = time.perf_counter()
+            try:
+                body = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+                values = server.forecast(body['key'], body['window'], body.get('horizon'))
+            except KeyError as e:
+                self._reply(404 if 'registry' in str(e) else 400, {'error': str(e)})
+                return
+            except Exception as e:
+                self._reply(400, {'error': f"{type(e).__name__}: {e}"})
+                return
+            self._reply(200, {'forecast': values, 'latency_ms': (time.perf_counter() - start) * 1e3})
+
+        def log_message(self, format, *args):
+            pass  # one line per request is too much at service rates
+
+    return ForecastHandler
+
+
+class ForecastHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 128  # the default listen backlog of 5 resets connections of request bursts
+    allow_reuse_address = True
+
+# params:
+#   - host, port - address the service listens on (localhost only by default)
+#   - registry, max_batch, max_wait, compiled - see ModelServer
+#   - warm_keys - registry keys loaded and traced before the service starts answering
+# returns (ForecastHTTPServer, ModelServer), call serve_forever on the first one
+def create_service(host='127.0.0.1', port=8765, registry=None, max_batch=32, max_wait=0.005, warm_keys=(), compiled=None):
+    server = ModelServer(registry, max_batch=max_batch, max_wait=max_wait, compiled=compiled)
+    for key in warm_keys:
+        server.warm_up(key)
+    httpd = ForecastHTTPServer((host, port), make_handler(server))
+    return httpd, server
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve registry model forecasts on localhost.")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--max-batch', type=int, default=32, help="most requests grouped into one predict call")
+    parser.add_argument('--max-wait-ms', type=float, default=5.0, help="how long a batch waits for more requests")
+    parser.add_argument('--compiled', choices=['float32', 'float16', 'int8'], default=None, help="serve the tflite export of the models")
+    parser.add_argument('--warm', nargs='*', default=[], help="registry keys to load before serving")
+    args = parser.parse_args(argv)
+
+    httpd, _ = create_service(args.host, args.port, max_batch=args.max_batch, max_wait=args.max_wait_ms / 1e3, warm_keys=args.warm, compiled=args.compiled)
+    print(f"serving forecasts on http://{args.host}:{args.port}")
+    try:
+        httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        httpd.server_close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
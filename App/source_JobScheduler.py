@@ -0,0 +1,257 @@
+import os
+import time
+import heapq
+import itertools
+import threading
+
+from source_ModelRegistry import config_key
+
+# FORECAST JOB SCHEDULER
+#
+# forecasts are submitted as jobs (the keyword arguments of source_Forecast.forecast) and run on worker threads
+#   - at most max_concurrent jobs train at the same time (defaults to half the cores, at most 4)
+#   - queued jobs start by priority (higher first), then in submit order
+#   - a job identical to one that is still queued or running (same data, config and params) is not queued
+#     again, submit returns the existing job
+#   - every job can be cancelled, a queued job is dropped and a running one stops at the next batch boundary
+# tensorflow's thread pools belong to the process, not to a thread, so they are sized once for all jobs:
+# the intra-op pool has one thread per core and is shared by the running jobs (instead of every job
+# assuming it owns all cores) and the inter-op pool gets one thread per concurrent job
+# threads_per_job (cores // max_concurrent) is the share of one job (job.threads), a runner that trains in its own
+# process uses it (see source_TrainingProcess.ProcessRunner)
+# on_change(job) is called whenever a job changes state, on_progress(job, stats) after every training epoch,
+# both on the worker threads (MainWindow passes Qt signal emits so they are queued to the ui thread)
+
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+CANCELLED = 'cancelled'
+
+
+def configure_tf_threads(intra_op, inter_op):
+    import tensorflow as tf
+    try:
+        tf.config.threading.set_intra_op_parallelism_threads(intra_op)
+        tf.config.threading.set_inter_op_parallelism_threads(inter_op)
+    except RuntimeError as e:
+        # tensorflow already ran an op in this process, its pools can not be resized anymore
+        print(f"keeping the current tensorflow thread pools: {e}")
+
+# identical jobs share a key, the series is identified by its length and last bar
+def job_key(forecast_kwargs):
+    params = {name: value for name, value in forecast_kwargs.items() if name not in ('df', 'registry', 'layers_config', 'ticker')}
+    df = forecast_kwargs['df']
+    params['rows'] = len(df)
+    params['last_date'] = str(df.date_at(-1)) if hasattr(df, 'date_at') else str(df['date'].iloc[-1])
+    return config_key(forecast_kwargs.get('ticker'), forecast_kwargs['layers_config'], params)
+
+# default runner, trains in the scheduler's worker thread
+def run_forecast(job, telemetry):
+    import source_Forecast as fc
+    return fc.forecast(**job.forecast_kwargs, cancel=job.cancel_event, telemetry=telemetry)
+
+
+class ForecastJob:
+
+    def __init__(self, job_id, key, label, priority, forecast_kwargs):
+        """
+        One submitted forecast.
+
+        Parameters:
+        - job_id: Integer id, increasing in submit order.
+        - key: job_key of the forecast_kwargs (identical jobs share it).
+        - label: Text shown for the job (ticker and bar size in the ui).
+        - priority: Integer, higher priority jobs start first.
+        - forecast_kwargs: Dictionary of source_Forecast.forecast keyword arguments.
+        """
+        self.job_id = job_id
+        self.key = key
+        self.label = label
+        self.priority = priority
+        self.forecast_kwargs = forecast_kwargs
+        self.state = QUEUED
+        self.result = None
+        self.error = None
+        self.progress = None  # stats dict of the last finished epoch
+        self.threads = None  # the job's share of the cores, set when it starts
+        self.cancel_event = threading.Event()
+        self.submitted_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+
+    @property
+    def active(self):
+        return self.state in (QUEUED, RUNNING)
+
+    def wait_s(self):
+        """
+        Seconds the job waited in the queue (so far if it has not started).
+        """
+        return (self.started_at or self.finished_at or time.time()) - self.submitted_at
+
+    def run_s(self):
+        """
+        Seconds the job has been running, None if it never started.
+        """
+        if self.started_at is None:
+            return None
+        return (self.finished_at or time.time()) - self.started_at
+
+
+class JobScheduler:
+
+    def __init__(self, max_concurrent=None, on_change=None, on_progress=None, runner=run_forecast, configure_threads=True):
+        """
+        Runs forecast jobs with bounded concurrency.
+
+        Parameters:
+        - max_concurrent: Integer, jobs trained at the same time (default: half the cores, at most 4).
+        - on_change: Function called with a job whenever its state changes.
+        - on_progress: Function called with (job, stats) after every training epoch of a job.
+        - runner: Function (job, telemetry) -> result that runs one job (default: run_forecast in a thread).
+        - configure_threads: Boolean, size the tensorflow thread pools for max_concurrent jobs.
+        """
+        cores = os.cpu_count() or 1
+        if max_concurrent is None:
+            max_concurrent = max(1, min(4, cores // 2))
+        self.max_concurrent = max_concurrent
+        self.threads_per_job = max(1, cores // max_concurrent)
+        self.on_change = on_change
+        self.on_progress = on_progress
+        self.runner = runner
+        if configure_threads:
+            configure_tf_threads(cores, max_concurrent)
+
+        self.jobs = []  # every submitted job in submit order
+        self._queue = []  # heap of (-priority, sequence, job), stale entries are skipped when popped
+        self._sequence = itertools.count()
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._threads = {}
+        self._closed = False
+
+    def submit(self, forecast_kwargs, label=None, priority=0):
+        """
+        Queues a forecast and returns its ForecastJob (or the identical job that is already queued or running).
+        """
+        key = job_key(forecast_kwargs)
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("The job scheduler was shut down.")
+            for job in self.jobs:
+                if job.key == key and job.active:
+                    duplicate = job
+                    break
+            else:
+                duplicate = None
+                job = ForecastJob(next(self._ids), key, label, priority, forecast_kwargs)
+                self.jobs.append(job)
+                heapq.heappush(self._queue, (-priority, next(self._sequence), job))
+
+        if duplicate is not None:
+            if priority > duplicate.priority:
+                self.set_priority(duplicate, priority)
+            return duplicate
+        self._notify(job)
+        self._dispatch()
+        return job
+
+    def set_priority(self, job, priority):
+        with self._lock:
+            job.priority = priority
+            if job.state == QUEUED:
+                heapq.heappush(self._queue, (-priority, next(self._sequence), job))
+        self._notify(job)
+
+    def cancel(self, job):
+        with self._lock:
+            if job.state == QUEUED:
+                job.state = CANCELLED
+                job.finished_at = time.time()
+            elif job.state == RUNNING:
+                job.cancel_event.set()
+            else:
+                return
+        self._notify(job)
+
+    def counts(self):
+        """
+        Returns a dictionary of state -> number of jobs in that state.
+        """
+        with self._lock:
+            counts = {state: 0 for state in (QUEUED, RUNNING, DONE, FAILED, CANCELLED)}
+            for job in self.jobs:
+                counts[job.state] += 1
+            return counts
+
+    def shutdown(self, cancel=True, wait=True):
+        """
+        Stops accepting jobs, optionally cancels the queued and running ones and waits for the workers
+        (without cancel the queued jobs still run before it returns).
+        """
+        with self._lock:
+            self._closed = True
+            jobs = [job for job in self.jobs if job.active]
+        if cancel:
+            for job in jobs:
+                self.cancel(job)
+        while wait:
+            with self._lock:
+                threads = list(self._threads.values())
+                queued = any(job.state == QUEUED for job in self.jobs)
+            if not threads and not queued:
+                break
+            for thread in threads:
+                thread.join()
+            if not threads:
+                time.sleep(0.05)  # a finished job is handing its slot to a queued one
+
+    def _notify(self, job):
+        if self.on_change is not None:
+            self.on_change(job)
+
+    def _dispatch(self):
+        started = []
+        with self._lock:
+            running = sum(1 for job in self.jobs if job.state == RUNNING)
+            while running < self.max_concurrent and self._queue:
+                neg_priority, _, job = heapq.heappop(self._queue)
+                if job.state != QUEUED or -neg_priority != job.priority:
+                    continue  # cancelled, already started or re-prioritised (a newer entry exists)
+                job.state = RUNNING
+                job.started_at = time.time()
+                job.threads = self.threads_per_job
+                thread = threading.Thread(target=self._run, args=(job,), name=f"forecast-job-{job.job_id}", daemon=True)
+                self._threads[job.job_id] = thread
+                started.append((job, thread))
+                running += 1
+
+        for job, thread in started:
+            self._notify(job)
+            thread.start()
+
+    def _run(self, job):
+        from source_Checkpoint import TrainingCancelled
+
+        def telemetry(stats):
+            job.progress = stats
+            if self.on_progress is not None:
+                self.on_progress(job, stats)
+
+        try:
+            job.result = self.runner(job, telemetry)
+            state = DONE
+        except TrainingCancelled as e:
+            job.error = e
+            state = CANCELLED
+        except Exception as e:
+            job.error = e
+            state = FAILED
+
+        with self._lock:
+            job.state = state
+            job.finished_at = time.time()
+            self._threads.pop(job.job_id, None)
+        self._notify(job)
+        self._dispatch()
@@ -0,0 +1,131 @@
+import math
+
+from tensorflow.keras.layers import Layer, Conv1D, Dense, Dropout, LayerNormalization, MultiHeadAttention # type: ignore
+from tensorflow.keras.utils import register_keras_serializable # type: ignore
+
+# WINDOW-PARALLEL LAYER TYPES
+#
+# layers_config types that process every bar of the window at once instead of stepping through it like the
+# recurrent layers, so they train much faster on cpu-only hosts
+#   - 'Conv1D' (TCNBlock) - stack of causal dilated convolutions with residual connections, dilations
+#     1, 2, 4, ... until the receptive field covers the whole window
+#   - 'Attention' (SelfAttentionBlock) - learned position embedding + one multi-head self-attention block
+#     with a position-wise feed forward layer, both residual and layer normalized (without return_sequences
+#     only the last bar attends to the window)
+# both take (batch, timesteps, features) and follow return_sequences like the recurrent layers: the whole
+# sequence (batch, timesteps, neurons) or only the last bar (batch, neurons)
+# they are registered as keras serializable, so registry and checkpoint models with them load with load_model
+# (this module has to be imported first, source_ModelRegistry and source_Checkpoint do that)
+
+
+@register_keras_serializable(package='StockPriceForecastModeler')
+class TCNBlock(Layer):
+
+    def __init__(self, filters, kernel_size=3, return_sequences=False, dropout=0.0, **kwargs):
+        """
+        Temporal convolution block.
+
+        Parameters:
+        - filters: Integer, channels of every convolution (the layer's neurons).
+        - kernel_size: Integer, bars seen by one convolution tap.
+        - return_sequences: Boolean, return every bar instead of only the last one.
+        - dropout: Float, dropout after every convolution while training.
+        """
+        super().__init__(**kwargs)
+        self.filters = filters
+        self.kernel_size = kernel_size
+        self.return_sequences = return_sequences
+        self.dropout = dropout
+        self.convs = []
+        self.projection = None
+
+    def build(self, input_shape):
+        timesteps = input_shape[1] or 1
+        # receptive field of levels 0..n-1 is 1 + (kernel_size - 1) * (2^n - 1)
+        levels = max(1, math.ceil(math.log2((timesteps - 1) / (self.kernel_size - 1) + 1))) if self.kernel_size > 1 else 1
+        self.convs = [Conv1D(self.filters, self.kernel_size, padding='causal', dilation_rate=2 ** level, activation='relu',
+                             dtype=self.dtype_policy, name=f'conv_{level}') for level in range(levels)]
+        if input_shape[-1] != self.filters:
+            self.projection = Conv1D(self.filters, 1, dtype=self.dtype_policy, name='projection')
+            self.projection.build(input_shape)
+        self.dropout_layer = Dropout(self.dropout, dtype=self.dtype_policy)
+
+        # the input is projected to filters channels first (when it has a different width), so every level sees filters
+        for conv in self.convs:
+            conv.build(tuple(input_shape[:-1]) + (self.filters,))
+        super().build(input_shape)
+
+    def call(self, inputs, training=None):
+        x = self.projection(inputs) if self.projection is not None else inputs
+        for conv in self.convs:
+            x = x + self.dropout_layer(conv(x), training=training)
+        return x if self.return_sequences else x[:, -1, :]
+
+    def compute_output_shape(self, input_shape):
+        if self.return_sequences:
+            return tuple(input_shape[:-1]) + (self.filters,)
+        return (input_shape[0], self.filters)
+
+    def get_config(self):
+        config = super().get_config()
+        config.update({'filters': self.filters, 'kernel_size': self.kernel_size,
+                       'return_sequences': self.return_sequences, 'dropout': self.dropout})
+        return config
+
+
+@register_keras_serializable(package='StockPriceForecastModeler')
+class SelfAttentionBlock(Layer):
+
+    def __init__(self, units, num_heads=4, return_sequences=False, dropout=0.0, **kwargs):
+        """
+        Transformer encoder block over the bars of the window.
+
+        Parameters:
+        - units: Integer, width of the block (the layer's neurons).
+        - num_heads: Integer, attention heads, lowered until it divides units.
+        - return_sequences: Boolean, return every bar instead of only the last one.
+        - dropout: Float, dropout of the attention weights and the feed forward output while training.
+        """
+        super().__init__(**kwargs)
+        self.units = units
+        self.num_heads = num_heads
+        self.return_sequences = return_sequences
+        self.dropout = dropout
+
+    def build(self, input_shape):
+        timesteps = input_shape[1]
+        heads = max(h for h in range(1, min(self.num_heads, self.units) + 1) if self.units % h == 0)
+        shape = tuple(input_shape[:-1]) + (self.units,)
+
+        self.embedding = Dense(self.units, dtype=self.dtype_policy, name='embedding')
+        self.embedding.build(input_shape)
+        self.positions = self.add_weight(name='positions', shape=(timesteps, self.units), initializer='zeros')
+        self.attention = MultiHeadAttention(heads, self.units // heads, dropout=self.dropout, dtype=self.dtype_policy, name='attention')
+        self.attention.build(shape, shape)
+        self.attention_norm = LayerNormalization(dtype=self.dtype_policy, name='attention_norm')
+        self.attention_norm.build(shape)
+        self.feed_forward = Dense(self.units, activation='relu', dtype=self.dtype_policy, name='feed_forward')
+        self.feed_forward.build(shape)
+        self.feed_forward_norm = LayerNormalization(dtype=self.dtype_policy, name='feed_forward_norm')
+        self.feed_forward_norm.build(shape)
+        self.dropout_layer = Dropout(self.dropout, dtype=self.dtype_policy)
+        super().build(input_shape)
+
+    def call(self, inputs, training=None):
+        x = self.embedding(inputs) + self.positions
+        # without return_sequences only the last bar is emitted, so only it has to query the window
+        query = x if self.return_sequences else x[:, -1:, :]
+        x = self.attention_norm(query + self.attention(query, x, training=training))
+        x = self.feed_forward_norm(x + self.dropout_layer(self.feed_forward(x), training=training))
+        return x if self.return_sequences else x[:, -1, :]
+
+    def compute_output_shape(self, input_shape):
+        if self.return_sequences:
+            return tuple(input_shape[:-1]) + (self.units,)
+        return (input_shape[0], self.units)
+
+    def get_config(self):
+        config = super().get_config()
+        config.update({'units': self.units, 'num_heads': self.num_heads,
+                       'return_sequences': self.return_sequences, 'dropout': self.dropout})
+        return config
@@ -1,31 +1,178 @@
+import os
+import json
+import time
+import random
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import yfinance as yf
 import pandas as pd
+import numpy as np
 import requests
 from bs4 import BeautifulSoup
 
+import source_DataCache as dc
+
 # MISC
 
-def get_data(ticker, length='max'):
+# params:
+#   - ticker - yahoo finance ticker symbol
+#   - length - yfinance period string ('max', '5y', '1mo', ...)
+#   - interval - bar size ('1d', '1h', ...)
+#   - use_cache - read and update the on-disk cache in source_DataCache (only used for length='max')
+def get_data(ticker, length='max', interval='1d', use_cache=True):
     try:
-        stock = yf.Ticker(ticker)
-        historical_data = stock.history(period=length)
-        df = historical_data[["Open", "High", "Low", "Close", "Volume"]].copy()
-        df.columns = df.columns.str.lower()
-        df.reset_index(inplace=True)
-        df['Date'] = pd.to_datetime(df['Date'])
-
-        # check if time step is in days
-        min_diff = df['Date'].diff().dropna().dt.days.min()
-        if min_diff >= 1:
-            df['Date'] = df['Date'].dt.date
-
-        df.rename(columns={"Date": "date"}, inplace=True)
-        return df
+        historical_data = load_history(ticker, length, interval, use_cache)
+        return normalize_history(historical_data)
     except:
         print(f'issue is probably that ticker {ticker} does not exist idk tho')
         return
 
-def read_csv(file_path):
+# turns a yf.Ticker.history frame into the lowercase 'date', open, high, low, close, volume frame used everywhere
+def normalize_history(historical_data):
+    df = historical_data[["Open", "High", "Low", "Close", "Volume"]].copy()
+    df.columns = df.columns.str.lower()
+    df.reset_index(inplace=True)
+    df.rename(columns={df.columns[0]: "Date"}, inplace=True)  # intraday history names the index 'Datetime'
+    df['Date'] = pd.to_datetime(df['Date'])
+
+    # check if time step is in days
+    min_diff = df['Date'].diff().dropna().dt.days.min()
+    if min_diff >= 1:
+        df['Date'] = df['Date'].dt.date
+
+    df.rename(columns={"Date": "date"}, inplace=True)
+    return df
+
+# yahoo only serves a limited window of intraday bars, so 'max' is capped per interval
+INTRADAY_MAX_PERIOD = {
+    '1m': '7d',
+    '2m': '60d',
+    '5m': '60d',
+    '15m': '60d',
+    '30m': '60d',
+    '60m': '730d',
+    '90m': '60d',
+    '1h': '730d',
+}
+
+def fetch_history(ticker, length='max', interval='1d', start=None, session=None):
+    stock = yf.Ticker(ticker, session=session)
+    if length == 'max':
+        length = INTRADAY_MAX_PERIOD.get(interval, length)
+    if start is not None:
+        historical_data = stock.history(start=start, interval=interval)
+    else:
+        historical_data = stock.history(period=length, interval=interval)
+    if historical_data.empty:
+        raise ValueError(f"no price history returned for ticker {ticker}")
+    return historical_data
+
+# returns the raw yfinance history for a ticker, going through the on-disk cache when possible
+#   - cache hit inside the ttl: no network call at all
+#   - cache hit past the ttl: only the bars after the last completed cached bar are downloaded and appended
+#   - restated history (overlapping bars changed) or a cache older than FULL_REFRESH_AGE: full redownload
+def load_history(ticker, length='max', interval='1d', use_cache=True, session=None):
+    # the cache always holds the full history, shorter periods go straight to yfinance
+    if not use_cache or length != 'max':
+        return fetch_history(ticker, length, interval, session=session)
+
+    cached = dc.load(ticker, interval)
+    if cached is None:
+        return _full_refresh(ticker, interval, session)
+
+    history, meta = cached
+    if dc.is_fresh(meta, interval):
+        return history
+    if dc.needs_full_refresh(meta) or len(history) < 2:
+        return _full_refresh(ticker, interval, session)
+
+    # the last cached bar may have been partial (fetched mid session), so refetch from the bar before it
+    # and use that completed bar to detect restated history
+    start = history.index[-2]
+    try:
+        fetched = fetch_history(ticker, interval=interval, start=start, session=session)
+    except ValueError:
+        dc.touch(ticker, interval, history, meta)
+        return history
+
+    if dc.is_restated(history.loc[history.index < history.index[-1]], fetched):
+        return _full_refresh(ticker, interval, session)
+
+    history = dc.merge(history, fetched)
+    dc.touch(ticker, interval, history, meta)
+    return history
+
+def _full_refresh(ticker, interval, session=None):
+    history = fetch_history(ticker, 'max', interval, session=session)
+    now = time.time()
+    dc.save(ticker, interval, history, {'fetched_at': now, 'full_fetched_at': now})
+    return history
+
+# per ticker failure returned by get_data_many instead of printing and returning None
+class TickerError:
+    def __init__(self, ticker, error, attempts):
+        self.ticker = ticker
+        self.error_type = type(error).__name__
+        self.message = str(error)
+        self.attempts = attempts
+
+    def __repr__(self):
+        return f"TickerError({self.ticker!r}, {self.error_type}: {self.message!r}, attempts={self.attempts})"
+
+# fetch many tickers concurrently
+# params:
+#   - tickers - list of ticker symbols
+#   - length, interval, use_cache - same as get_data
+#   - max_workers - size of the bounded thread pool (each worker holds at most one request in flight)
+#   - retries - extra attempts per ticker after the first failure
+#   - backoff - base delay in seconds, doubled on every retry (with a little jitter)
+#   - as_frame - if True the frames are concatenated into one long format frame with a 'ticker' column
+#   - session - optional http session shared by every worker. yfinance already reuses one pooled
+#       session across all Ticker objects when this is None, so connections are pooled either way
+# returns (data, errors) where data is {ticker: df} (or the long frame) and errors is {ticker: TickerError}
+def get_data_many(tickers, length='max', interval='1d', use_cache=True, max_workers=8, retries=3, backoff=0.5, as_frame=False, session=None):
+    frames = {}
+    errors = {}
+
+    def fetch_one(ticker):
+        for attempt in range(retries + 1):
+            try:
+                return normalize_history(load_history(ticker, length, interval, use_cache, session))
+            except Exception:
+                if attempt == retries:
+                    raise
+                time.sleep(backoff * (2 ** attempt) * (1 + random.random() * 0.25))
+
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(tickers)))) as executor:
+        futures = {executor.submit(fetch_one, ticker): ticker for ticker in tickers}
+        for future in as_completed(futures):
+            ticker = futures[future]
+            try:
+                frames[ticker] = future.result()
+            except Exception as e:
+                errors[ticker] = TickerError(ticker, e, retries + 1)
+
+    # keep the caller's ticker order instead of completion order
+    frames = {ticker: frames[ticker] for ticker in tickers if ticker in frames}
+
+    if as_frame:
+        if not frames:
+            return pd.DataFrame(columns=['ticker', 'date', 'open', 'high', 'low', 'close', 'volume']), errors
+        long_df = pd.concat([df.assign(ticker=ticker) for ticker, df in frames.items()], ignore_index=True)
+        long_df = long_df[['ticker'] + [col for col in long_df.columns if col != 'ticker']]
+        return long_df, errors
+    return frames, errors
+
+# params:
+#   - file_path - csv with the time column first
+#   - chunksize - optional, when set the file is streamed with read_csv_chunked instead of loaded in one go
+#   - **chunk_kwargs - passed to read_csv_chunked
+def read_csv(file_path, chunksize=None, **chunk_kwargs):
+    if chunksize is not None:
+        try:
+            return read_csv_chunked(file_path, chunksize=chunksize, **chunk_kwargs)
+        except FileNotFoundError:
+            print(f"File {file_path} does not exist.")
+            return
     try:
         df = pd.read_csv(file_path)
         df.columns = df.columns.str.lower()  # Standardize column names to lowercase
@@ -53,17 +200,141 @@ def read_csv(file_path):
         print(f"An error occurred: {e}")
         return
 
-def list_sp500_tickers():
-    url = "https://en.wikipedia.org/wiki/List_of_S%26P_500_companies"
-    response = requests.get(url)
+# streaming read for exports too large to load with default dtypes
+# params:
+#   - chunksize - rows parsed per chunk
+#   - price_dtype - dtype of every value column except volume (float32 by default)
+#   - volume_dtype - dtype of a 'volume' column (float64 keeps share counts exact and allows NaN)
+#   - max_gap - optional pandas timedelta (or string like '3D', '5min'), steps larger than this are reported as gaps
+#   - report - callable(info_dict) run after every chunk, defaults to printing a one line summary
+# returns a frame where 'date' is int64 epoch nanoseconds (UTC) and the value columns use the compact dtypes
+# raises ValueError if the time column is not strictly increasing (unsorted or duplicated rows)
+def read_csv_chunked(file_path, chunksize=1_000_000, price_dtype='float32', volume_dtype='float64', max_gap=None, report=None):
+    if report is None:
+        report = _print_chunk_report
+    if max_gap is not None:
+        max_gap = pd.Timedelta(max_gap).value
+
+    header = pd.read_csv(file_path, nrows=0).columns
+    time_column = header[0]
+    value_columns = list(header[1:])
+    dtypes = {col: (volume_dtype if col.lower() == 'volume' else price_dtype) for col in value_columns}
+    dtypes[time_column] = str
+
+    time_parts = []
+    value_parts = {col: [] for col in value_columns}
+    gaps = []
+    total_rows = 0
+    total_bytes = 0
+    last_ts = None
+
+    for chunk_index, chunk in enumerate(pd.read_csv(file_path, chunksize=chunksize, dtype=dtypes)):
+        ts = pd.to_datetime(chunk[time_column], utc=True).to_numpy(dtype='datetime64[ns]').astype(np.int64)
+
+        # sort order, including the step across the chunk boundary
+        steps = np.diff(ts) if last_ts is None else np.diff(np.concatenate(([last_ts], ts)))
+        offset = total_rows if last_ts is None else total_rows - 1
+        bad = np.flatnonzero(steps <= 0)
+        if len(bad) > 0:
+            row = offset + bad[0] + 1
+            raise ValueError(f"time column '{time_column}' is not strictly increasing at row {row}")
+
+        chunk_gaps = 0
+        if max_gap is not None:
+            gap_idx = np.flatnonzero(steps > max_gap)
+            chunk_gaps = len(gap_idx)
+            prev = ts if last_ts is None else np.concatenate(([last_ts], ts))
+            for k in gap_idx:
+                gaps.append((int(prev[k]), int(prev[k + 1])))
+
+        time_parts.append(ts)
+        chunk_bytes = ts.nbytes
+        for col in value_columns:
+            values = chunk[col].to_numpy()
+            value_parts[col].append(values)
+            chunk_bytes += values.nbytes
+
+        total_rows += len(ts)
+        total_bytes += chunk_bytes
+        if len(ts) > 0:
+            last_ts = ts[-1]
+
+        report({
+            'chunk': chunk_index,
+            'rows': len(ts),
+            'total_rows': total_rows,
+            'chunk_bytes': chunk_bytes,
+            'total_bytes': total_bytes,
+            'gaps': chunk_gaps
+        })
+
+    data = {'date': np.concatenate(time_parts) if time_parts else np.empty(0, dtype=np.int64)}
+    for col in value_columns:
+        data[col.lower()] = np.concatenate(value_parts[col]) if value_parts[col] else np.empty(0, dtype=dtypes[col])
+    df = pd.DataFrame(data, copy=False)
+    df.attrs['gaps'] = gaps
+    return df
+
+def _print_chunk_report(info):
+    print(f"chunk {info['chunk']}: {info['rows']} rows, {info['chunk_bytes'] / 1e6:.1f} MB "
+          f"(total {info['total_rows']} rows, {info['total_bytes'] / 1e6:.1f} MB, {info['gaps']} gaps)")
+
+SP500_URL = "https://en.wikipedia.org/wiki/List_of_S%26P_500_companies"
+
+# versioned on-disk copy of the constituent list so the main window never waits on wikipedia
+SP500_SNAPSHOT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cache', 'sp500_tickers.json')
+SP500_SNAPSHOT_VERSION = 1
+SP500_SNAPSHOT_MAX_AGE = 24 * 60 * 60  # seconds before a background refresh is started
+
+def list_sp500_tickers(timeout=30):
+    response = requests.get(SP500_URL, timeout=timeout)
     soup = BeautifulSoup(response.text, 'html.parser')
     table = soup.find('table', {'id': 'constituents'})
     tickers = [row.find('td').text.strip() for row in table.find_all('tr')[1:]]
     return tickers
 
+# returns (tickers, fetched_at), or ([], None) when there is no usable snapshot yet
+def load_sp500_snapshot(path=SP500_SNAPSHOT_PATH):
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            snapshot = json.load(f)
+        if snapshot.get('version') != SP500_SNAPSHOT_VERSION:
+            return [], None
+        return snapshot['tickers'], snapshot['fetched_at']
+    except FileNotFoundError:
+        return [], None
+    except Exception as e:
+        print(f"ignoring unreadable ticker snapshot {path}: {e}")
+        return [], None
+
+def save_sp500_snapshot(tickers, path=SP500_SNAPSHOT_PATH):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    snapshot = {
+        'version': SP500_SNAPSHOT_VERSION,
+        'fetched_at': time.time(),
+        'source': SP500_URL,
+        'tickers': list(tickers)
+    }
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(snapshot, f, indent=4)
+    os.replace(tmp_path, path)
+
+def sp500_snapshot_is_stale(fetched_at, max_age=SP500_SNAPSHOT_MAX_AGE):
+    return fetched_at is None or time.time() - fetched_at > max_age
+
+# scrapes the current list and writes it to the snapshot (meant to run off the gui thread)
+def refresh_sp500_snapshot(path=SP500_SNAPSHOT_PATH):
+    tickers = list_sp500_tickers()
+    if not tickers:
+        raise ValueError("scraped S&P 500 constituent list is empty")
+    save_sp500_snapshot(tickers, path)
+    return tickers
+
 #   - n_layers - number of sequential layers in the model NOT INCLUDING OUTPUT LAYER
 #       * the optional params must have the same number of elements as n_layers
 #   - layer_type_list - optional list param used for different types of layers (defualt sets all layers to LSTM)
+#       * 'LSTM', 'GRU', 'SimpleRNN', 'Dense', 'Conv1D' or 'Attention' (see source_SequentialModel)
 #       * example: ['lstm', 'gru', 'gru'] - makes layer1 type lstm and layers 2 and 3 type gru
 #   - layer_neuron_list - optional list param used for neuron count on different layers (default sets all layer neuron counts to 64)
 #       * example: [32, 64] - layer1 uses 32 neurons and layer2 uses 64
@@ -103,3 +374,41 @@ def create_layer_config(n_layers=2, layer_neuron_list=None, layer_type_list=None
         })
 
     return layers_config
+
+# turns the model_params json written by CreateModelWindow.on_setmodel_button_clicked into
+# source_Forecast.forecast keyword arguments (everything but the data, ticker and registry)
+# params:
+#   - model_params - dict with the CreateModelWindow layout, the last entry of layer_widgets_dict is the dropout layer
+def forecast_kwargs_from_params(model_params):
+    layer_data = model_params['layer_widgets_dict']
+    # create layer config and initialize dropout (dropout is in the layer_widgets_dict)
+    layer_neuron_list = []
+    layer_type_list = []
+    layer_return_list = []
+    dropout = 0
+    for i, layer in enumerate(layer_data):
+        if i != len(layer_data)-1:
+            layer_neuron_list.append(layer['neuron_spinbox'])
+            layer_type_list.append(layer['type_combobox'])
+            layer_return_list.append(layer['rseq'])
+        else:
+            dropout = layer['dropout_spinbox'] / 100
+    layer_count = len(layer_data) - 1 # not including the last dropout layer
+    layers_config = create_layer_config(layer_count, layer_neuron_list, layer_type_list, layer_return_list)
+
+    return {
+        'layers_config': layers_config,
+        'target_variable': model_params['target_variable'],
+        'training_cols': model_params['training_cols'],
+        'forecast_period': model_params['forecast_period'],
+        'epochs': model_params['epochs'],
+        'step_future': model_params['step_future'],
+        'step_past': model_params['step_past'],
+        'dropout': dropout,
+        'optimizer': model_params['optimizer'],
+        'loss': model_params['loss'],
+        'forecast_mode': model_params.get('forecast_mode', 'window'),
+        'performance_mode': model_params.get('performance_mode', False),
+        'early_stopping_patience': model_params.get('early_stopping_patience'),
+        'engine': model_params.get('engine', 'neural')
+    }
@@ -0,0 +1,106 @@
+import os
+import json
+import time
+import pickle
+import hashlib
+import numpy as np
+
+# TRAINED MODEL REGISTRY
+#
+# a trained model is stored under a key built from everything that changes what gets trained:
+# the ticker (plus bar size), layers_config and the hyperparameters (including the precision settings,
+# performance_mode and mixed_precision, since they change the trained weights)
+# each entry is a folder (cache/models/<key>/) with:
+#   - model.keras - the keras model (weights and optimizer state)
+#   - scaler.pkl - the StandardScaler the model was trained with
+#   - meta.json - the config (layers_config, hyperparams, forecast_mode), how many rows it was trained on
+#     and a fingerprint of those rows
+#   - optional compiled exports of the model (see source_CompiledModel), dropped whenever the model is saved again
+# the fingerprint lets a later run check that the rows the model already saw were not restated
+# before it fine-tunes only on the new windows
+
+REGISTRY_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cache', 'models')
+
+
+def config_key(ticker, layers_config, hyperparams):
+    config = {'ticker': ticker, 'layers_config': layers_config, 'hyperparams': hyperparams}
+    blob = json.dumps(config, sort_keys=True, default=str)
+    return hashlib.sha1(blob.encode('utf-8')).hexdigest()[:16]
+
+# fingerprint of the first n_rows rows of the unscaled training matrix
+def data_fingerprint(matrix, n_rows=None):
+    rows = np.ascontiguousarray(matrix[:n_rows], dtype=np.float64)
+    digest = hashlib.sha1(rows.tobytes())
+    digest.update(str(rows.shape).encode('utf-8'))
+    return digest.hexdigest()
+
+
+class ModelRegistry:
+
+    def __init__(self, root=REGISTRY_DIR):
+        """
+        On-disk store of trained models keyed by config_key.
+
+        Parameters:
+        - root: Folder the entries are stored in.
+        """
+        self.root = root
+
+    def entry_path(self, key):
+        return os.path.join(self.root, key)
+
+    def load(self, key):
+        """
+        Returns (model, scaler, meta) for a key, or None if there is no usable entry.
+        """
+        path = self.entry_path(key)
+        if not os.path.exists(os.path.join(path, 'meta.json')):
+            return None
+        try:
+            from tensorflow.keras.models import load_model # type: ignore
+            import source_Layers  # registers the custom layer types load_model may need
+            with open(os.path.join(path, 'meta.json'), 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+            with open(os.path.join(path, 'scaler.pkl'), 'rb') as f:
+                scaler = pickle.load(f)
+            model = load_model(os.path.join(path, 'model.keras'))
+            return model, scaler, meta
+        except Exception as e:
+            print(f"ignoring unreadable model registry entry {path}: {e}")
+            return None
+
+    def save(self, key, model, scaler, meta):
+        """
+        Writes (or replaces) the entry for a key.
+        """
+        path = self.entry_path(key)
+        os.makedirs(path, exist_ok=True)
+        meta = dict(meta)
+        meta['key'] = key
+        meta['saved_at'] = time.time()
+
+        self._remove_compiled(path)
+        model.save(os.path.join(path, 'model.keras'))
+        with open(os.path.join(path, 'scaler.pkl'), 'wb') as f:
+            pickle.dump(scaler, f)
+        # meta is written last, an entry without it is never loaded
+        with open(os.path.join(path, 'meta.json'), 'w', encoding='utf-8') as f:
+            json.dump(meta, f, indent=4, default=str)
+
+    # exports of an older model would silently serve stale weights
+    def _remove_compiled(self, path):
+        if not os.path.isdir(path):
+            return
+        for name in os.listdir(path):
+            if name.endswith('.tflite') or (name.startswith('compiled_') and name.endswith('.json')):
+                os.remove(os.path.join(path, name))
+
+    def remove(self, key):
+        path = self.entry_path(key)
+        self._remove_compiled(path)
+        for name in ('meta.json', 'scaler.pkl', 'model.keras'):
+            file_path = os.path.join(path, name)
+            if os.path.exists(file_path):
+                os.remove(file_path)
+        if os.path.isdir(path) and not os.listdir(path):
+            os.rmdir(path)
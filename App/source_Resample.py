@@ -0,0 +1,189 @@
+import numpy as np
+import pandas as pd
+
+from source_TimeSeries import TimeSeries
+
+# VECTORIZED OHLCV RESAMPLING
+#
+# bars are grouped by (exchange-local day, bar index since session open) so a bar never spans two
+# sessions and intraday bars line up with the open (09:30, 10:30, ... for '1h') instead of the hour
+# aggregation per bar: open=first, high=max, low=min, close=last, volume=sum, all done with ufunc.reduceat
+
+NS_PER_DAY = 24 * 60 * 60 * 10**9
+
+# bar sizes as shown in the ui mapped to pandas timedelta strings
+BAR_RULES = {
+    '1m': '1min',
+    '5m': '5min',
+    '15m': '15min',
+    '30m': '30min',
+    '1h': '1h',
+    '1d': '1D',
+}
+
+AGGREGATIONS = {
+    'open': 'first',
+    'high': 'max',
+    'low': 'min',
+    'close': 'last',
+    'volume': 'sum',
+}
+
+
+def _to_ns(rule):
+    return pd.Timedelta(BAR_RULES.get(rule, rule)).value
+
+def _time_of_day_ns(time_str):
+    return pd.Timedelta(f"{time_str}:00" if time_str.count(':') == 1 else time_str).value
+
+# params:
+#   - dates - int64 epoch nanoseconds (UTC), sorted ascending
+#   - rule_ns - bar size in nanoseconds
+#   - tz - exchange timezone the session boundaries are defined in
+#   - session_start - session open time of day ('09:30')
+#   - session_end - optional session close time of day, rows outside [start, end) are dropped
+# returns (keep_mask, group_starts, bar_start_ns) where bar_start_ns is UTC
+def bin_bars(dates, rule_ns, tz='America/New_York', session_start='09:30', session_end=None):
+    utc = pd.DatetimeIndex(pd.to_datetime(dates, utc=True))
+    local = utc.tz_convert(tz).tz_localize(None).asi8
+    tz_offset = local - dates
+
+    day = local // NS_PER_DAY
+    time_of_day = local - day * NS_PER_DAY
+    open_ns = _time_of_day_ns(session_start)
+
+    keep = np.ones(len(dates), dtype=bool)
+    if session_end is not None:
+        keep = (time_of_day >= open_ns) & (time_of_day < _time_of_day_ns(session_end))
+
+    if rule_ns >= NS_PER_DAY:
+        days_per_bar = rule_ns // NS_PER_DAY
+        key = day // days_per_bar
+        bar_start_local = key * days_per_bar * NS_PER_DAY
+        bar_key = key
+        day_key = key
+    else:
+        bar_index = (time_of_day - open_ns) // rule_ns  # negative for pre-market bars
+        bar_start_local = day * NS_PER_DAY + open_ns + bar_index * rule_ns
+        bar_key = bar_index
+        day_key = day
+
+    day_key = day_key[keep]
+    bar_key = bar_key[keep]
+    new_group = np.empty(len(day_key), dtype=bool)
+    if len(day_key) > 0:
+        new_group[0] = True
+        new_group[1:] = (np.diff(day_key) != 0) | (np.diff(bar_key) != 0)
+    group_starts = np.flatnonzero(new_group)
+
+    # label bars with their start converted back to UTC using the offset of the first row in the bar
+    bar_start = bar_start_local[keep][group_starts] - tz_offset[keep][group_starts]
+    return keep, group_starts, bar_start
+
+# aggregates one column per group with the reduction in AGGREGATIONS (or 'last' for unknown columns)
+def aggregate(values, group_starts, how):
+    if len(group_starts) == 0:
+        return values[:0]
+    if how == 'first':
+        return values[group_starts]
+    if how == 'last':
+        ends = np.append(group_starts[1:], len(values)) - 1
+        return values[ends]
+    if how == 'max':
+        return np.maximum.reduceat(values, group_starts)
+    if how == 'min':
+        return np.minimum.reduceat(values, group_starts)
+    if how == 'sum':
+        return np.add.reduceat(values, group_starts)
+    raise ValueError(f"Unsupported aggregation: {how}")
+
+# params:
+#   - dates - int64 epoch nanoseconds (UTC), sorted ascending
+#   - columns - dict of column name -> numpy array (same length as dates)
+#   - rule - bar size ('5m', '1h', '1d' or any pandas timedelta string)
+#   - tz, session_start, session_end - see bin_bars
+# returns (bar_dates, bar_columns, bar_first_row_dates)
+def resample_arrays(dates, columns, rule, tz='America/New_York', session_start='09:30', session_end=None, row_dates=None):
+    dates = np.asarray(dates, dtype=np.int64)
+    # row_dates lets already aggregated bars be binned by the time of their first raw row
+    bin_dates = dates if row_dates is None else np.asarray(row_dates, dtype=np.int64)
+    keep, group_starts, bar_dates = bin_bars(bin_dates, _to_ns(rule), tz, session_start, session_end)
+
+    bar_columns = {}
+    for name, values in columns.items():
+        values = np.asarray(values)[keep]
+        bar_columns[name] = aggregate(values, group_starts, AGGREGATIONS.get(name, 'last'))
+    return bar_dates, bar_columns, bin_dates[keep][group_starts]
+
+# frame wrapper around resample_arrays using the app's 'date', open, high, low, close, volume layout
+def resample_ohlcv(df, rule, tz='America/New_York', session_start='09:30', session_end=None):
+    dates = pd.to_datetime(df['date'], utc=True).to_numpy(dtype='datetime64[ns]').astype(np.int64)
+    columns = {col: df[col].to_numpy() for col in df.columns if col != 'date'}
+    bar_dates, bar_columns, _ = resample_arrays(dates, columns, rule, tz, session_start, session_end)
+    return _to_frame(bar_dates, bar_columns, _to_ns(rule), tz)
+
+def _to_frame(bar_dates, bar_columns, rule_ns, tz):
+    date_index = pd.to_datetime(bar_dates, utc=True).tz_convert(tz)
+    if rule_ns >= NS_PER_DAY:
+        date_col = date_index.date  # daily bars keep python dates like get_data does
+    else:
+        date_col = date_index
+    df = pd.DataFrame({'date': date_col})
+    for name, values in bar_columns.items():
+        df[name] = values
+    return df
+
+
+# holds one source series and every bar size already built from it
+# switching back to a bar size that was already built is a dict lookup, and coarser bars are built
+# from the coarsest cached bars that divide them instead of from the raw rows
+class ResampleCache:
+
+    def __init__(self, tz='America/New_York', session_start='09:30', session_end=None):
+        self.tz = tz
+        self.session_start = session_start
+        self.session_end = session_end
+        self.source = None
+        self.source_rule_ns = None
+        self.first_rows = {}  # rule_ns -> date of the first raw row in every bar
+        self.series = {}  # rule_ns -> TimeSeries
+
+    def set_source(self, series, source_rule):
+        self.source = series
+        self.source_rule_ns = _to_ns(source_rule)
+        self.first_rows.clear()
+        self.series.clear()
+
+        self.first_rows[self.source_rule_ns] = series.dates
+        self.series[self.source_rule_ns] = series
+
+    def precompute(self, rules):
+        for rule in sorted(rules, key=_to_ns):
+            self.get(rule)
+
+    def get(self, rule):
+        rule_ns = _to_ns(rule)
+        if rule_ns in self.series:
+            return self.series[rule_ns]
+        if self.source is None:
+            raise ValueError("ResampleCache has no source data")
+        if rule_ns < self.source_rule_ns:
+            raise ValueError(f"Cannot resample {self.source_rule_ns}ns bars down to {rule_ns}ns bars")
+
+        # coarsest cached intraday bar size that evenly divides the requested one
+        base_ns = self.source_rule_ns
+        for cached_ns in self.series:
+            if cached_ns > base_ns and cached_ns < NS_PER_DAY and rule_ns % cached_ns == 0:
+                base_ns = cached_ns
+        base = self.series[base_ns]
+
+        bar_dates, bar_columns, bar_first_rows = resample_arrays(base.dates, base.columns, f"{rule_ns}ns", self.tz,
+            self.session_start, self.session_end, row_dates=self.first_rows[base_ns])
+        if rule_ns >= NS_PER_DAY:
+            # daily bars are stored at local midnight like the daily data from get_data
+            local_midnight = pd.to_datetime(bar_first_rows, utc=True).tz_convert(self.tz).normalize().tz_localize(None)
+            bar_dates = local_midnight.to_numpy(dtype='datetime64[ns]').astype(np.int64)
+
+        self.first_rows[rule_ns] = bar_first_rows
+        self.series[rule_ns] = TimeSeries(bar_dates, bar_columns, daily=rule_ns >= NS_PER_DAY, tz=self.source.tz or self.tz)
+        return self.series[rule_ns]
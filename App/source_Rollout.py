@@ -0,0 +1,66 @@
+import weakref
+import numpy as np
+
+# AUTOREGRESSIVE MULTI-STEP ROLLOUT
+#
+# the model predicts the forecasted variable (scaled column 0) step_future bars past the end of its window
+# one rollout iteration:
+#   - predicts the value step_future bars ahead for every window in the batch
+#   - appends step_future new rows to each window: column 0 is interpolated from the last value to the
+#     prediction, the other training columns are carried forward from the last row (they are not forecasted)
+#   - drops the oldest rows so the window keeps its length
+# the whole loop runs inside one tf.function, so many start points and the full horizon are a single call
+
+_compiled = weakref.WeakKeyDictionary()  # model -> {(horizon, n_future, jit_compile): tf.function}
+
+
+def make_rollout_fn(model, horizon, n_future=1, jit_compile=False):
+    import tensorflow as tf
+
+    iterations = -(-horizon // n_future)  # ceil
+    fractions = tf.constant(np.arange(1, n_future + 1) / n_future, dtype=tf.float32)
+
+    @tf.function(reduce_retracing=True, jit_compile=jit_compile)
+    def rollout(windows):
+        windows = tf.cast(windows, tf.float32)
+        steps = tf.TensorArray(tf.float32, size=iterations)
+        for i in tf.range(iterations):
+            prediction = tf.cast(model(windows, training=False), tf.float32)[:, 0:1]  # (batch, 1)
+            last = windows[:, -1, :]  # (batch, features)
+
+            target = last[:, 0:1] + (prediction - last[:, 0:1]) * fractions[None, :]  # (batch, n_future)
+            carried = tf.repeat(last[:, None, 1:], n_future, axis=1)  # (batch, n_future, features - 1)
+            new_rows = tf.concat([target[:, :, None], carried], axis=2)
+
+            windows = tf.concat([windows[:, n_future:, :], new_rows], axis=1)[:, -windows.shape[1]:, :]
+            steps = steps.write(i, target)
+        # (iterations, batch, n_future) -> (batch, iterations * n_future)
+        out = tf.reshape(tf.transpose(steps.stack(), [1, 0, 2]), [tf.shape(windows)[0], iterations * n_future])
+        return out[:, :horizon]
+
+    return rollout
+
+def get_rollout_fn(model, horizon, n_future=1, jit_compile=False):
+    fns = _compiled.setdefault(model, {})
+    if (horizon, n_future, jit_compile) not in fns:
+        fns[(horizon, n_future, jit_compile)] = make_rollout_fn(model, horizon, n_future, jit_compile)
+    return fns[(horizon, n_future, jit_compile)]
+
+# params:
+#   - model - trained keras model taking (batch, n_past, features) windows
+#   - scaled - 2d scaled array (rows, features) the model was trained on
+#   - n_past, n_future - step_past and step_future the model was trained with
+#   - horizon - bars to roll forward
+#   - ends - row positions the rollouts start after (every window ends at that row), defaults to the last row
+#   - jit_compile - compile the whole rollout loop with XLA
+# returns (len(ends), horizon) scaled predictions of column 0
+def rollout_forecast(model, scaled, n_past, n_future, horizon, ends=None, jit_compile=False):
+    if ends is None:
+        ends = [len(scaled) - 1]
+    ends = np.asarray(ends)
+    if (ends < n_past - 1).any() or (ends >= len(scaled)).any():
+        raise ValueError(f"Rollout start rows must be between {n_past - 1} and {len(scaled) - 1}.")
+
+    windows = scaled[ends[:, None] - n_past + 1 + np.arange(n_past)[None, :]]  # (len(ends), n_past, features)
+    rollout = get_rollout_fn(model, horizon, n_future, jit_compile)
+    return rollout(np.asarray(windows, dtype=np.float32)).numpy()
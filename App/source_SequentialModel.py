@@ -3,27 +3,40 @@ import os
 os.environ['TF_CPP_MIN_LOG_LEVEL'] = '3'
 
 from tensorflow.keras.models import Sequential # type: ignore
-from tensorflow.keras.layers import LSTM, Dropout, Dense, GRU, SimpleRNN # type: ignore
+from tensorflow.keras.layers import LSTM, Dropout, Dense, GRU, SimpleRNN, Flatten # type: ignore
+
+from source_Layers import TCNBlock, SelfAttentionBlock
 
 class SequentialModel:
 
-    def __init__(self, input_shape, output_shape, layers_config, dropout, optimizer, loss):
+    def __init__(self, input_shape, output_shape, layers_config, dropout, optimizer, loss, jit_compile='auto', steps_per_execution=1, mixed_precision=False):
         """
         Initializes the neural network model.
 
         Parameters:
         - input_shape: Tuple (timesteps, features) specifying input data shape.
         - output_shape: Integer specifying the number of output features.
+                        Values above 1 make a direct multi-horizon head (one output per future step). A sequence
+                        coming out of the last layer is flattened first so the head emits (batch, output_shape).
         - layers_config: List of dictionaries specifying the configuration for each layer.
                          Each dictionary should have keys 'neurons', 'layer_type', and additional layer-specific parameters.
+                         'Conv1D' and 'Attention' layers process the whole window in parallel (see source_Layers).
         - net_type: String specifying the type of neural network ('LSTM', 'GRU', 'SimpleRNN', etc.).
         - dropout: Float specifying dropout rate (default: 0.2).
         - optimizer: String specifying the optimizer to use (default: 'adam').
         - loss: String specifying the loss function to use (default: 'mse').
+        - jit_compile: Boolean, compile the train and predict steps with XLA (default: 'auto', keras decides, off on cpu).
+        - steps_per_execution: Integer specifying the batches run per compiled call (default: 1).
+        - mixed_precision: Boolean, compute the hidden layers in bfloat16 with float32 weights (default: False).
+                           The output head always stays float32.
         """
         self.model = Sequential()
 
+        # dtype policy of the hidden layers, bfloat16 is the mixed precision type cpus support
+        extra = {'dtype': 'mixed_bfloat16'} if mixed_precision else {}
+
         # Add layers based on configuration
+        sequence = True  # the output still has the time axis (Dense keeps it, a layer without return_sequences drops it)
         for i, layer in enumerate(layers_config):
             layer_type = layer.get('layer_type')
             neurons = layer.get('neurons')
@@ -31,30 +44,46 @@ class SequentialModel:
 
             if layer_type == 'Dense':
                 if i == 0:
-                    self.model.add(Dense(neurons, input_shape=input_shape))
+                    self.model.add(Dense(neurons, input_shape=input_shape, **extra))
                 else:
-                    self.model.add(Dense(neurons))
+                    self.model.add(Dense(neurons, **extra))
             elif layer_type == 'LSTM':
                 if i == 0:
-                    self.model.add(LSTM(neurons, input_shape=input_shape, return_sequences=return_sequences))
+                    self.model.add(LSTM(neurons, input_shape=input_shape, return_sequences=return_sequences, **extra))
                 else:
-                    self.model.add(LSTM(neurons, return_sequences=return_sequences))
+                    self.model.add(LSTM(neurons, return_sequences=return_sequences, **extra))
             elif layer_type == 'GRU':
                 if i == 0:
-                    self.model.add(GRU(neurons, input_shape=input_shape, return_sequences=return_sequences))
+                    self.model.add(GRU(neurons, input_shape=input_shape, return_sequences=return_sequences, **extra))
                 else:
-                    self.model.add(GRU(neurons, return_sequences=return_sequences))
+                    self.model.add(GRU(neurons, return_sequences=return_sequences, **extra))
             elif layer_type == 'SimpleRNN':
                 if i == 0:
-                    self.model.add(SimpleRNN(neurons, input_shape=input_shape, return_sequences=return_sequences))
+                    self.model.add(SimpleRNN(neurons, input_shape=input_shape, return_sequences=return_sequences, **extra))
+                else:
+                    self.model.add(SimpleRNN(neurons, return_sequences=return_sequences, **extra))
+            elif layer_type == 'Conv1D':
+                if i == 0:
+                    self.model.add(TCNBlock(neurons, input_shape=input_shape, return_sequences=return_sequences, **extra))
                 else:
-                    self.model.add(SimpleRNN(neurons, return_sequences=return_sequences))
+                    self.model.add(TCNBlock(neurons, return_sequences=return_sequences, **extra))
+            elif layer_type == 'Attention':
+                if i == 0:
+                    self.model.add(SelfAttentionBlock(neurons, input_shape=input_shape, return_sequences=return_sequences, **extra))
+                else:
+                    self.model.add(SelfAttentionBlock(neurons, return_sequences=return_sequences, **extra))
             else:
                 raise ValueError(f"Unsupported layer type: {layer_type}")
+            if layer_type != 'Dense':
+                sequence = bool(return_sequences)
+
+        # the head needs a flat input, a sequence that no layer collapsed (e.g. only Dense layers) is flattened
+        if sequence:
+            self.model.add(Flatten())
 
         self.model.add(Dropout(dropout))
-        self.model.add(Dense(output_shape))
-        self.model.compile(optimizer=optimizer, loss=loss)
+        self.model.add(Dense(output_shape, dtype='float32'))
+        self.model.compile(optimizer=optimizer, loss=loss, jit_compile=jit_compile, steps_per_execution=steps_per_execution)
 
     def get_model(self):
         """
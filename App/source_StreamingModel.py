@@ -0,0 +1,250 @@
+import time
+import numpy as np
+
+# STATEFUL STREAMING INFERENCE
+#
+# the recurrent layers of a trained SequentialModel are run bar by bar in numpy, so a new bar costs one recurrent
+# step instead of rebuilding and rerunning every step_past long window
+# the model was trained on windows that start from a zero state, so one state carried forward forever is not the
+# model that was trained, there are two modes:
+#   - 'exact' - n_past staggered lanes per stream, lane (t mod n_past) restarts from a zero state at bar t, so
+#     after bar t the lane that restarted n_past - 1 bars ago has seen exactly the window ending at t and its output
+#     is the windowed model's output (up to float rounding). a bar is one recurrent step of n_past lanes at once
+#   - 'carry' - one state per stream that is never reset, a bar is one recurrent step of one lane
+#     (cheapest, but the state remembers bars older than the window, check the drift with verify_equivalence)
+# every stream (e.g. one ticker) has its own states, update takes one row per stream so many tickers that get
+# a bar at the same time are stepped together
+# supported models: LSTM, GRU (reset_after) and SimpleRNN layers with Dense layers around them, the output must be
+# the last state (models with a flattened sequence head need the whole window and are not supported)
+
+MODES = ('exact', 'carry')
+
+ACTIVATIONS = {
+    'tanh': np.tanh,
+    'sigmoid': lambda x: 1.0 / (1.0 + np.exp(-x)),
+    'relu': lambda x: np.maximum(x, 0.0),
+    'linear': lambda x: x,
+}
+
+
+def _activation(fn):
+    name = getattr(fn, '__name__', str(fn))
+    if name not in ACTIVATIONS:
+        raise ValueError(f"Unsupported activation for streaming: {name}")
+    return ACTIVATIONS[name]
+
+# keras layers -> list of numpy ops, ('dense', kernel, bias, activation) or (cell type, weights..., units, activations)
+def extract_ops(model):
+    ops = []
+    for layer in model.layers:
+        name = type(layer).__name__
+        if name == 'Dropout':
+            continue  # identity at inference
+        weights = [w.astype(np.float64) for w in layer.get_weights()]
+        if name == 'Dense':
+            bias = weights[1] if len(weights) > 1 else np.zeros(weights[0].shape[1])
+            ops.append(('dense', weights[0], bias, _activation(layer.activation)))
+        elif name in ('LSTM', 'GRU', 'SimpleRNN'):
+            cell = layer.cell
+            if name == 'GRU' and not cell.reset_after:
+                raise ValueError("Streaming supports GRU layers with reset_after=True (the keras default) only.")
+            kernel, recurrent = weights[0], weights[1]
+            if len(weights) > 2:
+                bias = weights[2]
+            else:
+                bias = np.zeros((2, kernel.shape[1]) if name == 'GRU' else kernel.shape[1])
+            recurrent_activation = _activation(cell.recurrent_activation) if name != 'SimpleRNN' else None
+            ops.append((name, kernel, recurrent, bias, cell.units, _activation(cell.activation), recurrent_activation,
+                        layer.return_sequences))
+        else:
+            raise ValueError(f"Unsupported layer for streaming: {name}")
+
+    recurrent = [i for i, op in enumerate(ops) if op[0] != 'dense']
+    if not recurrent:
+        raise ValueError("Streaming needs at least one recurrent layer.")
+    if ops[recurrent[-1]][-1]:
+        raise ValueError("The last recurrent layer must not return sequences, the model's output has to be its last state.")
+    return ops
+
+
+class StreamingModel:
+
+    def __init__(self, model, n_past, mode='exact', n_streams=1, scaler=None):
+        """
+        Bar by bar inference of a trained recurrent model.
+
+        Parameters:
+        - model: Trained keras model (see SequentialModel) taking (batch, n_past, features) windows.
+        - n_past: Integer, step_past the model was trained with.
+        - mode: String, one of MODES.
+        - n_streams: Integer, independent series stepped together (one row per stream per update).
+        - scaler: Optional StandardScaler the model was trained with, update then takes unscaled rows and
+                  returns unscaled forecasts of column 0 (direct models return every horizon step).
+        """
+        if mode not in MODES:
+            raise ValueError(f"`mode` must be one of {MODES}, but got {mode}.")
+        self.ops = extract_ops(model)
+        self.n_past = n_past
+        self.mode = mode
+        self.n_streams = n_streams
+        self.scaler = scaler
+        self.n_lanes = n_past if mode == 'exact' else 1
+
+        # ops up to the last recurrent layer run every bar, the ones after it only on the emitted state
+        last = max(i for i, op in enumerate(self.ops) if op[0] != 'dense')
+        self.step_ops = self.ops[:last + 1]
+        self.head_ops = self.ops[last + 1:]
+        self.reset()
+
+    def reset(self):
+        """
+        Drops every state, the next n_past bars warm the streams up again.
+        """
+        shape = (self.n_streams, self.n_lanes)
+        self.states = []
+        for op in self.step_ops:
+            if op[0] == 'LSTM':
+                self.states.append((np.zeros(shape + (op[4],)), np.zeros(shape + (op[4],))))
+            elif op[0] != 'dense':
+                self.states.append(np.zeros(shape + (op[4],)))
+            else:
+                self.states.append(None)
+        self.bars = 0
+
+    def _step(self, x):
+        # x: (streams, lanes, features) -> output of the last recurrent layer (streams, lanes, units)
+        for i, op in enumerate(self.step_ops):
+            kind = op[0]
+            if kind == 'dense':
+                _, kernel, bias, activation = op
+                x = activation(x @ kernel + bias)
+                continue
+
+            _, kernel, recurrent, bias, units, activation, recurrent_activation, _ = op
+            if kind == 'LSTM':
+                h, c = self.states[i]
+                z = x @ kernel + h @ recurrent + bias
+                gate_i = recurrent_activation(z[..., :units])
+                gate_f = recurrent_activation(z[..., units:2 * units])
+                gate_c = activation(z[..., 2 * units:3 * units])
+                gate_o = recurrent_activation(z[..., 3 * units:])
+                c = gate_f * c + gate_i * gate_c
+                h = gate_o * activation(c)
+                self.states[i] = (h, c)
+            elif kind == 'GRU':
+                h = self.states[i]
+                x_proj = x @ kernel + bias[0]
+                h_proj = h @ recurrent + bias[1]
+                gate_z = recurrent_activation(x_proj[..., :units] + h_proj[..., :units])
+                gate_r = recurrent_activation(x_proj[..., units:2 * units] + h_proj[..., units:2 * units])
+                candidate = activation(x_proj[..., 2 * units:] + gate_r * h_proj[..., 2 * units:])
+                h = gate_z * h + (1.0 - gate_z) * candidate
+                self.states[i] = h
+            else:
+                h = activation(x @ kernel + self.states[i] @ recurrent + bias)
+                self.states[i] = h
+            x = h
+        return x
+
+    def _head(self, x):
+        for _, kernel, bias, activation in self.head_ops:
+            x = activation(x @ kernel + bias)
+        return x
+
+    def update(self, rows):
+        """
+        Steps every stream by one bar (rows: (n_streams, features), or (features,) for a single stream).
+        Returns (n_streams, outputs) forecasts of the windows ending at this bar, None while warming up.
+        """
+        rows = np.asarray(rows, dtype=np.float64)
+        if rows.ndim == 1:
+            rows = rows[None]
+        if len(rows) != self.n_streams:
+            raise ValueError(f"`rows` must have one row per stream ({self.n_streams}), but got {len(rows)}.")
+        if self.scaler is not None:
+            rows = (rows - self.scaler.mean_) / self.scaler.scale_
+
+        if self.mode == 'exact':
+            # the lane that starts its window at this bar
+            lane = self.bars % self.n_past
+            for state in self.states:
+                if isinstance(state, tuple):
+                    state[0][:, lane] = 0.0
+                    state[1][:, lane] = 0.0
+                elif state is not None:
+                    state[:, lane] = 0.0
+        x = np.broadcast_to(rows[:, None, :], (self.n_streams, self.n_lanes, rows.shape[1]))
+        hidden = self._step(x)
+        self.bars += 1
+        if self.bars < self.n_past:
+            return None
+
+        # the lane that started n_past - 1 bars ago has seen exactly the last window
+        done = (self.bars - self.n_past) % self.n_past if self.mode == 'exact' else 0
+        output = self._head(hidden[:, done])
+        if self.scaler is not None:
+            output = output * self.scaler.scale_[0] + self.scaler.mean_[0]
+        return output
+
+    def prime(self, history):
+        """
+        Feeds past bars (history: (bars, n_streams, features), or (bars, features) for a single stream) and returns
+        the output after the last one. In 'exact' mode only the last n_past bars matter.
+        """
+        history = np.asarray(history, dtype=np.float64)
+        if self.mode == 'exact':
+            history = history[-self.n_past:]
+        output = None
+        for rows in history:
+            output = self.update(rows)
+        return output
+
+# loads a registry entry as a StreamingModel that takes and returns unscaled values
+def stream_from_registry(registry, key, mode='exact', n_streams=1):
+    saved = registry.load(key)
+    if saved is None:
+        raise KeyError(f"No model in the registry for key {key}.")
+    model, scaler, meta = saved
+    if 'hyperparams' not in meta:
+        raise ValueError(f"Registry entry {key} was saved without its hyperparams, forecast it once more to update it.")
+    return StreamingModel(model, meta['hyperparams']['step_past'], mode=mode, n_streams=n_streams, scaler=scaler)
+
+# params:
+#   - model - trained keras model
+#   - scaled - 2d scaled array (rows, features) streamed bar by bar
+#   - n_past - step_past the model was trained with
+#   - mode - streaming mode to check
+#   - n_streams - the series is streamed as this many identical streams (checks that streams stay independent)
+# returns a dictionary with the largest difference between the streamed and the windowed outputs
+# (scaled units, exact mode should stay around 1e-6) and the time per bar of both
+def verify_equivalence(model, scaled, n_past, mode='exact', n_streams=1):
+    from source_Windowing import build_windows
+    from source_CompiledModel import predict_windows
+
+    scaled = np.asarray(scaled, dtype=np.float64)
+    windows, _ = build_windows(scaled, n_past, 1)
+    windows = np.concatenate([windows, scaled[None, -n_past:]])  # build_windows leaves out the last window
+    start = time.perf_counter()
+    expected = predict_windows(model, windows)
+    windowed_s = time.perf_counter() - start
+
+    stream = StreamingModel(model, n_past, mode=mode, n_streams=n_streams)
+    outputs = []
+    start = time.perf_counter()
+    for row in scaled:
+        output = stream.update(np.repeat(row[None], n_streams, axis=0))
+        if output is not None:
+            outputs.append(output)
+    streamed_s = time.perf_counter() - start
+    streamed = np.array(outputs)  # (windows, streams, outputs)
+
+    error = np.abs(streamed - expected[:, None, :])
+    return {
+        'mode': mode,
+        'windows': len(expected),
+        'streams': n_streams,
+        'max_abs': float(error.max()),
+        'mean_abs': float(error.mean()),
+        'streamed_us_per_bar': streamed_s / len(scaled) * 1e6,
+        'windowed_batch_us_per_window': windowed_s / len(expected) * 1e6,
+    }
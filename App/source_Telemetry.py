@@ -0,0 +1,88 @@
+import sys
+import time
+
+# TRAINING TELEMETRY
+#
+# a keras callback that hands a stats dict to a report function after every training epoch:
+#   - epoch, epochs - finished epoch (1 based) and the epoch budget of the fit
+#   - loss, val_loss - losses of the epoch (val_loss is None without validation data)
+#   - epoch_s - wall time of the epoch
+#   - samples_per_s - training windows per second in the epoch
+#   - eta_s - remaining epochs x mean epoch time so far
+#   - peak_memory_mb - peak resident memory of the process so far (None if it can not be read)
+# the report function is called on the training thread, ForecastWorker passes a Qt signal's emit
+# so the stats are queued over to the ui thread
+
+
+# peak resident memory of this process in bytes, None if the platform does not expose it
+def peak_memory_bytes():
+    try:
+        if sys.platform == 'win32':
+            import ctypes
+            from ctypes import wintypes
+
+            class PROCESS_MEMORY_COUNTERS(ctypes.Structure):
+                _fields_ = [('cb', wintypes.DWORD), ('PageFaultCount', wintypes.DWORD),
+                            ('PeakWorkingSetSize', ctypes.c_size_t), ('WorkingSetSize', ctypes.c_size_t),
+                            ('QuotaPeakPagedPoolUsage', ctypes.c_size_t), ('QuotaPagedPoolUsage', ctypes.c_size_t),
+                            ('QuotaPeakNonPagedPoolUsage', ctypes.c_size_t), ('QuotaNonPagedPoolUsage', ctypes.c_size_t),
+                            ('PagefileUsage', ctypes.c_size_t), ('PeakPagefileUsage', ctypes.c_size_t)]
+
+            counters = PROCESS_MEMORY_COUNTERS()
+            counters.cb = ctypes.sizeof(counters)
+            process = ctypes.windll.kernel32.GetCurrentProcess()
+            if not ctypes.windll.psapi.GetProcessMemoryInfo(process, ctypes.byref(counters), counters.cb):
+                return None
+            return int(counters.PeakWorkingSetSize)
+
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # linux reports kilobytes, macos bytes
+        return int(peak) if sys.platform == 'darwin' else int(peak) * 1024
+    except Exception:
+        return None
+
+# params:
+#   - report - function called with the stats dict after every epoch
+#   - n_samples - training windows per epoch (for samples_per_s)
+# returns a keras callback, the collected stats dicts are kept in its .epochs list
+def make_telemetry_callback(report, n_samples):
+    from tensorflow.keras.callbacks import Callback # type: ignore
+
+    class TrainingTelemetry(Callback):
+        def __init__(self):
+            super().__init__()
+            self.epochs = []
+            self.epoch_start = None
+
+        def on_epoch_begin(self, epoch, logs=None):
+            self.epoch_start = time.perf_counter()
+
+        def on_epoch_end(self, epoch, logs=None):
+            if self.model.stop_training:
+                return  # cut short at a batch boundary (cancelled), not a full epoch
+            logs = logs or {}
+            epoch_s = time.perf_counter() - self.epoch_start
+            total = self.params.get('epochs', epoch + 1)
+            mean_epoch_s = (sum(stats['epoch_s'] for stats in self.epochs) + epoch_s) / (len(self.epochs) + 1)
+            peak = peak_memory_bytes()
+
+            stats = {
+                'epoch': epoch + 1,
+                'epochs': total,
+                'loss': float(logs['loss']) if 'loss' in logs else None,
+                'val_loss': float(logs['val_loss']) if 'val_loss' in logs else None,
+                'epoch_s': epoch_s,
+                'samples_per_s': n_samples / epoch_s if epoch_s > 0 else None,
+                'eta_s': mean_epoch_s * (total - epoch - 1),
+                'peak_memory_mb': peak / 1e6 if peak is not None else None
+            }
+            self.epochs.append(stats)
+            report(stats)
+
+    return TrainingTelemetry()
+
+# stops a fit once val_loss has not improved for patience epochs and restores the best weights
+def make_early_stopping(patience):
+    from tensorflow.keras.callbacks import EarlyStopping # type: ignore
+    return EarlyStopping(monitor='val_loss', patience=patience, restore_best_weights=True)
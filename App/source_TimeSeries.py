@@ -0,0 +1,203 @@
+import numpy as np
+import pandas as pd
+
+NS_PER_DAY = 24 * 60 * 60 * 10**9
+
+# prices are stored as float32, volume as float64 so share counts above 2^24 stay exact
+# (same split as source_Misc.read_csv_chunked and source_DataCache)
+PRICE_DTYPE = np.float32
+COLUMN_DTYPES = {'volume': np.float64}
+
+
+def column_dtype(name):
+    return COLUMN_DTYPES.get(str(name).lower(), PRICE_DTYPE)
+
+
+class TimeSeries:
+
+    def __init__(self, dates, columns, daily=None, tz=None, dtypes=None):
+        """
+        Compact, array backed price series shared by the loaders, forecasting and the graph.
+
+        Parameters:
+        - dates: int64 epoch nanoseconds, sorted ascending (UTC for intraday bars, midnight for daily bars).
+        - columns: Dictionary of column name -> array with the same length as dates, stored as contiguous arrays
+                   (float32, volume float64, see column_dtype).
+        - daily: Bool, True if the bars are at least a day apart (inferred from the dates when None).
+        - tz: Optional timezone name used when intraday dates are shown.
+        - dtypes: Optional dictionary of column name -> dtype overriding column_dtype.
+        """
+        dtypes = dtypes or {}
+        self.dates = np.ascontiguousarray(dates, dtype=np.int64)
+        self.columns = {}
+        for name, values in columns.items():
+            values = np.ascontiguousarray(values, dtype=dtypes.get(name, column_dtype(name)))
+            if len(values) != len(self.dates):
+                raise ValueError(
+                    f"Column `{name}` length must be equal to the number of dates. "
+                    f"Expected {len(self.dates)}, but got {len(values)}."
+                )
+            self.columns[name] = values
+
+        if daily is None:
+            steps = np.diff(self.dates)
+            daily = len(steps) == 0 or steps.min() >= NS_PER_DAY
+        self.daily = daily
+        self.tz = tz
+
+    @classmethod
+    def from_frame(cls, df, date_column='date', dtypes=None):
+        """
+        Builds a series from a frame in the app's layout ('date' plus numeric columns).
+        dtypes optionally overrides column_dtype per column.
+        """
+        dtypes = dtypes or {}
+        dates = pd.to_datetime(df[date_column])
+        tz = None
+        if dates.dt.tz is not None:
+            tz = str(dates.dt.tz)
+            dates = dates.dt.tz_convert('UTC').dt.tz_localize(None)
+        dates = dates.to_numpy(dtype='datetime64[ns]').astype(np.int64)
+
+        columns = {}
+        for col in df.columns:
+            if col == date_column:
+                continue
+            columns[col] = pd.to_numeric(df[col], errors='coerce').to_numpy(dtype=dtypes.get(col, column_dtype(col)))
+        return cls(dates, columns, tz=tz, dtypes=dtypes)
+
+    def to_frame(self):
+        """
+        Returns the series as a frame in the app's layout (python dates for daily bars).
+        """
+        df = pd.DataFrame({'date': self.date_values()})
+        for name, values in self.columns.items():
+            df[name] = values
+        return df
+
+    def __len__(self):
+        return len(self.dates)
+
+    def __getitem__(self, name):
+        return self.columns[name]
+
+    @property
+    def column_names(self):
+        return list(self.columns.keys())
+
+    @property
+    def dtypes(self):
+        return {name: values.dtype for name, values in self.columns.items()}
+
+    def column(self, name, start=None, stop=None):
+        """
+        Returns a zero-copy view of a column, optionally limited to rows [start, stop).
+        """
+        return self.columns[name][start:stop]
+
+    def matrix(self, names, dtype=np.float64, start=None, stop=None):
+        """
+        Returns the given columns stacked as a (rows, len(names)) array (a copy, in the requested dtype).
+        """
+        out = np.empty((len(self.dates[start:stop]), len(names)), dtype=dtype)
+        for j, name in enumerate(names):
+            out[:, j] = self.columns[name][start:stop]
+        return out
+
+    def slice(self, start=None, stop=None):
+        """
+        Returns rows [start, stop) as a new series whose arrays are views into this one.
+        """
+        columns = {name: values[start:stop] for name, values in self.columns.items()}
+        return TimeSeries(self.dates[start:stop], columns, daily=self.daily, tz=self.tz, dtypes=self.dtypes)
+
+    def to_ns(self, date):
+        """
+        Converts a date, datetime, Timestamp or string to the int64 representation used in self.dates.
+        """
+        ts = pd.Timestamp(date)
+        if ts.tzinfo is not None:
+            ts = ts.tz_convert('UTC').tz_localize(None)
+        elif self.tz is not None and not self.daily:
+            ts = ts.tz_localize(self.tz).tz_convert('UTC').tz_localize(None)
+        return ts.value
+
+    def index_of(self, date, side='left'):
+        """
+        Binary search for the row position of a date (same semantics as np.searchsorted).
+        """
+        return int(np.searchsorted(self.dates, self.to_ns(date), side=side))
+
+    def between(self, start=None, end=None):
+        """
+        Returns the rows with start <= date <= end as a zero-copy series, found in O(log n).
+        """
+        i = 0 if start is None else self.index_of(start, side='left')
+        j = len(self.dates) if end is None else self.index_of(end, side='right')
+        return self.slice(i, j)
+
+    def date_at(self, i):
+        """
+        Returns row i's date for display (a python date for daily bars, a Timestamp otherwise).
+        """
+        ts = pd.Timestamp(int(self.dates[i]))
+        if self.daily:
+            return ts.date()
+        if self.tz is not None:
+            return ts.tz_localize('UTC').tz_convert(self.tz)
+        return ts
+
+    def date_values(self):
+        """
+        Returns every date in display form (python dates for daily bars, datetime64/Timestamps otherwise).
+        """
+        index = pd.to_datetime(self.dates)
+        if self.daily:
+            return index.date
+        if self.tz is not None:
+            return index.tz_localize('UTC').tz_convert(self.tz)
+        return index
+
+    def append(self, other):
+        """
+        Returns a new series with other's rows after this one's. Columns missing on either side are NaN.
+        """
+        names = list(self.columns) + [name for name in other.columns if name not in self.columns]
+        dtypes = dict(other.dtypes, **self.dtypes)
+        columns = {}
+        for name in names:
+            left = self.columns.get(name)
+            right = other.columns.get(name)
+            if left is None:
+                left = np.full(len(self), np.nan, dtype=dtypes[name])
+            if right is None:
+                right = np.full(len(other), np.nan, dtype=dtypes[name])
+            columns[name] = np.concatenate((left, right)).astype(dtypes[name], copy=False)
+        return TimeSeries(np.concatenate((self.dates, other.dates)), columns, daily=self.daily, tz=self.tz, dtypes=dtypes)
+
+# params:
+#   - df - optional frame in the app's layout, defaults to a few daily bars with volumes above 2^24
+#          (float32 would round 99,999,999 to 100,000,000)
+# returns a dictionary with the number of values that changed going through from_frame and to_frame per volume
+# column (prices are float32 by design and not compared) and the stored dtype of every column
+def verify_round_trip(df=None):
+    if df is None:
+        df = pd.DataFrame({
+            'date': pd.date_range('2020-01-01', periods=4).date,
+            'close': [1.5, 2.25, 3.125, 4.0],
+            'volume': [99_999_999, 30_000_001, 2**24 + 1, 123_456_789_012],
+        })
+    series = TimeSeries.from_frame(df)
+    out = series.to_frame()
+    changed = {}
+    for name in series.column_names:
+        if str(name).lower() != 'volume':
+            continue
+        expected = pd.to_numeric(df[name], errors='coerce').to_numpy(dtype=np.float64)
+        got = out[name].to_numpy(dtype=np.float64)
+        changed[name] = int(np.sum((got != expected) & ~(np.isnan(got) & np.isnan(expected))))
+    return {'changed': changed, 'dtypes': {name: str(dtype) for name, dtype in series.dtypes.items()}}
+
+
+if __name__ == "__main__":
+    print(verify_round_trip())
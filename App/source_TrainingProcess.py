@@ -0,0 +1,134 @@
+import queue
+import traceback
+import multiprocessing
+from multiprocessing import shared_memory
+import numpy as np
+
+from source_TimeSeries import TimeSeries
+
+# OUT OF PROCESS TRAINING
+#
+# a source_JobScheduler runner that trains every job in its own spawned process, so tensorflow and the
+# data preparation around it never hold the gui process' GIL
+#   - the series the job trains on (dates and the training columns) is copied once into a shared memory
+#     block, the worker maps it as numpy views instead of unpickling a copy
+#   - the worker sends ('progress', stats), ('result', frame) or ('error', ...) messages back over a queue,
+#     the scheduler thread polls it and hands progress to the job's telemetry
+#   - cancelling the job sets an event shared with the worker, training stops at the next batch boundary
+#   - the worker gets job.threads tensorflow intra-op threads, so concurrent jobs split the cores
+
+
+class WorkerError(Exception):
+    def __init__(self, name, message, remote_traceback):
+        super().__init__(f"{name}: {message}")
+        self.name = name
+        self.remote_traceback = remote_traceback
+
+
+# copies dates and columns into one shared memory block
+# returns (block, layout), the layout is what the worker needs to map the arrays again
+def share_series(series, column_names):
+    arrays = [('date', series.dates)] + [(name, series.column(name)) for name in column_names]
+    size = sum(array.nbytes for _, array in arrays)
+    block = shared_memory.SharedMemory(create=True, size=max(size, 1))
+
+    layout = {'name': block.name, 'rows': len(series), 'daily': series.daily, 'tz': series.tz, 'arrays': []}
+    offset = 0
+    for name, array in arrays:
+        view = np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf, offset=offset)
+        view[:] = array
+        layout['arrays'].append((name, array.dtype.str, offset))
+        offset += array.nbytes
+    return block, layout
+
+# maps a shared series in the worker, returns (block, TimeSeries of views into the block)
+def attach_series(layout):
+    block = shared_memory.SharedMemory(name=layout['name'])
+    arrays = {name: np.ndarray((layout['rows'],), dtype=np.dtype(dtype), buffer=block.buf, offset=offset)
+              for name, dtype, offset in layout['arrays']}
+    dates = arrays.pop('date')
+    return block, TimeSeries(dates, arrays, daily=layout['daily'], tz=layout['tz'])
+
+
+def _train_worker(layout, forecast_kwargs, channel, cancel, tf_threads):
+    try:
+        if tf_threads is not None:
+            import tensorflow as tf
+            tf.config.threading.set_intra_op_parallelism_threads(tf_threads)
+            tf.config.threading.set_inter_op_parallelism_threads(1)
+        import source_Forecast as fc
+
+        block, series = attach_series(layout)
+        try:
+            result = fc.forecast(series, **forecast_kwargs, cancel=cancel,
+                telemetry=lambda stats: channel.put(('progress', stats)))
+        finally:
+            # the views must be gone before the block can be closed, the process exits right after anyway
+            del series
+            try:
+                block.close()
+            except BufferError:
+                pass
+        channel.put(('result', result))
+    except Exception as e:
+        epochs_done = getattr(e, 'epochs_done', None)
+        channel.put(('error', type(e).__name__, str(e), traceback.format_exc(), epochs_done))
+
+
+class ProcessRunner:
+
+    def __init__(self, poll_interval=0.1):
+        """
+        source_JobScheduler runner that trains each job in a spawned process.
+
+        Parameters:
+        - poll_interval: Float, seconds between checks of the channel, the cancel flag and the worker.
+        """
+        self.poll_interval = poll_interval
+        self.context = multiprocessing.get_context('spawn')
+
+    def __call__(self, job, telemetry):
+        from source_Checkpoint import TrainingCancelled
+
+        forecast_kwargs = dict(job.forecast_kwargs)
+        df = forecast_kwargs.pop('df')
+        series = df if isinstance(df, TimeSeries) else TimeSeries.from_frame(df)
+        block, layout = share_series(series, forecast_kwargs.get('training_cols', ["open", "high", "low", "close", "volume"]))
+
+        channel = self.context.Queue()
+        cancel = self.context.Event()
+        process = self.context.Process(target=_train_worker, args=(layout, forecast_kwargs, channel, cancel, job.threads),
+                                       name=f"forecast-job-{job.job_id}", daemon=True)
+        try:
+            process.start()
+            while True:
+                if job.cancel_event.is_set():
+                    cancel.set()
+                try:
+                    message = channel.get(timeout=self.poll_interval)
+                except queue.Empty:
+                    if process.is_alive():
+                        continue
+                    # a message may still be in flight when the process exits
+                    try:
+                        message = channel.get(timeout=1.0)
+                    except queue.Empty:
+                        raise RuntimeError(f"Training process exited with code {process.exitcode} without a result.")
+                if message[0] != 'progress':
+                    break
+                telemetry(message[1])
+
+            if message[0] == 'result':
+                return message[1]
+            _, name, text, remote_traceback, epochs_done = message
+            if name == 'TrainingCancelled':
+                raise TrainingCancelled(epochs_done or 0)
+            print(remote_traceback)
+            raise WorkerError(name, text, remote_traceback)
+        finally:
+            process.join(timeout=5.0)
+            if process.is_alive():
+                process.terminate()
+                process.join()
+            block.close()
+            block.unlink()
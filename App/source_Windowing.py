@@ -0,0 +1,105 @@
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+# SLIDING WINDOW CONSTRUCTION FOR TRAINING
+#
+# sample k of the training set is:
+#   - x: rows [k, k + n_past) of the scaled array, every feature
+#   - y: row k + n_past + n_future - 1 of the scaled array, first feature (the forecasted variable)
+# build_windows returns both as strided views over the scaled array, nothing is copied
+
+
+def n_windows(n_rows, n_past, n_future):
+    return n_rows - n_past - n_future + 1
+
+# params:
+#   - scaled - 2d array (rows, features)
+#   - n_past - rows in every input window (step_past)
+#   - n_future - how far past the end of the window the target is (step_future)
+# returns (trainX, trainY) with shapes (N, n_past, features) and (N, 1), both views of scaled
+def build_windows(scaled, n_past, n_future):
+    n = n_windows(len(scaled), n_past, n_future)
+    if n <= 0:
+        raise ValueError(
+            f"Not enough rows to build a training window. "
+            f"Need more than {n_past + n_future - 1} rows, but got {len(scaled)}."
+        )
+    # (rows - n_past + 1, features, n_past) -> (rows - n_past + 1, n_past, features)
+    trainX = sliding_window_view(scaled, n_past, axis=0).transpose(0, 2, 1)[:n]
+    trainY = scaled[n_past + n_future - 1:, 0:1]
+    return trainX, trainY
+
+# direct multi-horizon variant of build_windows
+# sample k is x: rows [k, k + n_past), y: column 0 of rows [k + n_past, k + n_past + horizon)
+# returns (trainX, trainY) with shapes (N, n_past, features) and (N, horizon), both views of scaled
+def build_direct_windows(scaled, n_past, horizon):
+    n = n_windows(len(scaled), n_past, horizon)
+    if n <= 0:
+        raise ValueError(
+            f"Not enough rows to build a training window. "
+            f"Need more than {n_past + horizon - 1} rows, but got {len(scaled)}."
+        )
+    trainX = sliding_window_view(scaled, n_past, axis=0).transpose(0, 2, 1)[:n]
+    trainY = sliding_window_view(scaled[n_past:, 0], horizon)[:n]
+    return trainX, trainY
+
+# the original per sample loop, kept as the reference build_windows is checked and benchmarked against
+def build_windows_loop(scaled, n_past, n_future):
+    trainX = []
+    trainY = []
+    for i in range(n_past, len(scaled) - n_future + 1):
+        trainX.append(scaled[i - n_past:i, 0:scaled.shape[1]])
+        trainY.append(scaled[i + n_future - 1:i + n_future, 0])
+    return np.array(trainX), np.array(trainY)
+
+# streaming alternative to build_windows for when (N, n_past, features) does not fit in memory
+# only the scaled base array lives in memory, windows are gathered batch by batch inside the tf.data graph
+# params:
+#   - scaled - 2d array (rows, features)
+#   - n_past, n_future - same as build_windows
+#   - indices - window start positions to serve (defaults to every window)
+#   - batch_size - windows per batch
+#   - shuffle - reshuffle the window order every epoch
+#   - prefetch - batches prepared ahead of the training step (tf.data.AUTOTUNE by default)
+#   - num_parallel_calls - parallelism of the gather map (tf.data.AUTOTUNE by default)
+#   - horizon - optional, serve direct multi-horizon targets (see build_direct_windows) instead of one step
+def make_window_dataset(scaled, n_past, n_future, indices=None, batch_size=16, shuffle=False, prefetch=None, num_parallel_calls=None, seed=None, horizon=None):
+    import tensorflow as tf
+
+    target_span = n_future if horizon is None else horizon
+    n = n_windows(len(scaled), n_past, target_span)
+    if n <= 0:
+        raise ValueError(
+            f"Not enough rows to build a training window. "
+            f"Need more than {n_past + target_span - 1} rows, but got {len(scaled)}."
+        )
+    if indices is None:
+        indices = np.arange(n)
+    if prefetch is None:
+        prefetch = tf.data.AUTOTUNE
+    if num_parallel_calls is None:
+        num_parallel_calls = tf.data.AUTOTUNE
+
+    base = tf.constant(scaled, dtype=tf.float32)
+    offsets = tf.range(n_past, dtype=tf.int64)
+    if horizon is None:
+        target_offsets = tf.constant([n_past + n_future - 1], dtype=tf.int64)
+    else:
+        target_offsets = n_past + tf.range(horizon, dtype=tf.int64)
+
+    def gather(batch_starts):
+        x = tf.gather(base, batch_starts[:, None] + offsets[None, :])  # (batch, n_past, features)
+        y = tf.gather(base[:, 0], batch_starts[:, None] + target_offsets[None, :])  # (batch, 1 or horizon)
+        return x, y
+
+    ds = tf.data.Dataset.from_tensor_slices(np.asarray(indices, dtype=np.int64))
+    if shuffle:
+        ds = ds.shuffle(len(indices), seed=seed, reshuffle_each_iteration=True)
+    ds = ds.batch(batch_size)
+    ds = ds.map(gather, num_parallel_calls=num_parallel_calls)
+    return ds.prefetch(prefetch)
+
+# splits window start positions the way keras' validation_split does (the last fraction is held out)
+def split_window_indices(n, validation_split=0.1):
+    split_at = int(n * (1.0 - validation_split))
+    return np.arange(split_at), np.arange(split_at, n)
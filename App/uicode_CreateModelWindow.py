@@ -1,4 +1,4 @@
-from PySide6.QtCore import Signal, Qt
+from PySide6.QtCore import Signal, Qt, QRect
 from PySide6.QtWidgets import (
     QMainWindow,
     QSpinBox,
@@ -21,6 +21,10 @@ class CreateModelWindow(QMainWindow):
 
     data_submitted = Signal(str)
 
+    LAYER_TYPES = ["LSTM", "GRU", "SimpleRNN", "Dense", "Conv1D", "Attention"]
+    # layer types that take the whole window (sequence) as input, see add_return_seq
+    SEQUENCE_TYPES = ["LSTM", "GRU", "SimpleRNN", "Conv1D", "Attention"]
+
     def __init__(self, column_names, target_variable, parent=None):
         super().__init__(parent)
         self.ui = Ui_CreateModel()
@@ -48,6 +52,27 @@ class CreateModelWindow(QMainWindow):
         self.ui.trainingcols_listwidget.setSelectionMode(QListWidget.MultiSelection)
         self.ui.trainingcols_listwidget.selectAll()
 
+        # how the forecast horizon is produced (see source_Forecast.forecast forecast_mode)
+        self.forecastmode_label = QLabel("Mode", self)
+        self.forecastmode_label.setGeometry(QRect(280, 225, 35, 20))
+        self.forecastmode_combobox = QComboBox(self)
+        self.forecastmode_combobox.setGeometry(QRect(318, 224, 100, 22))
+        self.forecastmode_combobox.addItems(["window", "rollout", "direct"])
+        self.forecastmode_combobox.setCurrentText("window")
+
+        # opt-in float32 training pipeline (see source_Forecast.forecast performance_mode)
+        self.performance_checkbox = QCheckBox("float32 mode", self)
+        self.performance_checkbox.setGeometry(QRect(540, 224, 110, 22))
+
+        # stop training once val_loss stops improving for this many epochs (0 trains every epoch)
+        self.patience_label = QLabel("Patience", self)
+        self.patience_label.setGeometry(QRect(558, 143, 45, 20))
+        self.patience_spinbox = QSpinBox(self)
+        self.patience_spinbox.setGeometry(QRect(604, 142, 46, 22))
+        self.patience_spinbox.setRange(0, 100)
+        self.patience_spinbox.setValue(0)
+        self.patience_spinbox.setToolTip("Early stopping on val_loss, 0 is off")
+
 
         self.updating_layers = False
         self.layer_count = 0
@@ -147,7 +172,7 @@ class CreateModelWindow(QMainWindow):
                 # combobox for type of layer
                 type_combobox = QComboBox(self)
                 type_combobox.setFixedSize(140,20)
-                type_combobox.addItems(["LSTM", "GRU", "SimpleRNN", "Dense"]) # Example types
+                type_combobox.addItems(self.LAYER_TYPES)
                 layer_layout.addWidget(type_combobox, alignment=Qt.AlignLeft)
                 layer_data['type_combobox'] = type_combobox
 
@@ -236,8 +261,8 @@ class CreateModelWindow(QMainWindow):
     def add_return_seq(self):
         for i, layer in enumerate(self.layer_widgets_dict):
             if i < len(self.layer_widgets_dict)-2:
-                if (layer['type_combobox'].currentText() in ['LSTM', 'GRU', 'SimpleRNN'] and
-                    self.layer_widgets_dict[i+1]['type_combobox'].currentText() in ['LSTM', 'GRU', 'SimpleRNN']):
+                if (layer['type_combobox'].currentText() in self.SEQUENCE_TYPES and
+                    self.layer_widgets_dict[i+1]['type_combobox'].currentText() in self.SEQUENCE_TYPES):
                     layer['rseq'] = True
                 else:
                     layer['rseq'] = False
@@ -254,6 +279,9 @@ class CreateModelWindow(QMainWindow):
         epochs = self.ui.epochs_spinbox.value()
         optimizer = self.ui.optimizer_combobox.currentText()
         loss = self.ui.loss_combobox.currentText()
+        forecast_mode = self.forecastmode_combobox.currentText()
+        performance_mode = self.performance_checkbox.isChecked()
+        early_stopping_patience = self.patience_spinbox.value()
         target_variable = self.target_variable
         trainingcols = []
         for row in range(self.ui.trainingcols_listwidget.count()):
@@ -282,6 +310,9 @@ class CreateModelWindow(QMainWindow):
             "epochs": epochs,
             "optimizer": optimizer,
             "loss": loss,
+            "forecast_mode": forecast_mode,
+            "performance_mode": performance_mode,
+            "early_stopping_patience": early_stopping_patience,
             "target_variable": target_variable,
             "training_cols": trainingcols
         }
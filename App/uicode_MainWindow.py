@@ -1,17 +1,27 @@
-from PySide6.QtCore import Signal, QThread
+from PySide6.QtCore import Signal, QThread, QRect, QObject
 from PySide6.QtWidgets import (
     QMainWindow,
     QApplication,
     QFileDialog,
     QMessageBox,
-    QVBoxLayout
+    QVBoxLayout,
+    QComboBox,
+    QLabel,
+    QPushButton,
+    QWidget
 )
 
 import sys
 import os
 import json
 import source_Misc as mc
+import source_Resample as rs
 import source_Forecast as fc
+from source_ModelRegistry import ModelRegistry
+from source_TimeSeries import TimeSeries
+from source_JobScheduler import JobScheduler
+import source_JobScheduler as js
+from source_TrainingProcess import ProcessRunner
 
 # Important:
 # You need to run the following command to generate the ui_form.py file
@@ -20,51 +30,79 @@ import source_Forecast as fc
 from ui_form_main import Ui_MainWindow
 from uicode_CreateModelWindow import CreateModelWindow
 from uisource_GraphWidget import GraphWidget
+from uisource_LossChartWidget import LossChartWidget
+from uisource_JobListWidget import JobListWidget
 
-# helper worker thread class to run the forecast function
-class ForecastWorker(QThread):
-    finished = Signal(object)
+# carries the job scheduler callbacks (called on its worker threads) over to the ui thread
+class JobSignals(QObject):
+    changed = Signal(object)  # ForecastJob whose state changed
+    progress = Signal(object, object)  # (ForecastJob, per epoch stats dict, see source_Telemetry)
 
-    def __init__(self, df, layers_config, target_var, training_cols, forecast_period, epochs, step_future, step_past, dropout, optimizer, loss):
-        super().__init__()
-        self.df = df
-        self.layers_config = layers_config
-        self.target_var = target_var
-        self.training_cols = training_cols
-        self.forecast_period = forecast_period
-        self.epochs = epochs
-        self.step_future = step_future
-        self.step_past = step_past
-        self.dropout = dropout
-        self.optimizer = optimizer
-        self.loss = loss
+# helper worker thread class to refresh the S&P 500 snapshot without blocking startup
+class TickerListWorker(QThread):
+    finished = Signal(object)
 
     def run(self):
-        forecast_df = None
         try:
-            forecast_df = fc.forecast(self.df, self.layers_config, self.target_var, training_cols=self.training_cols,
-                forecast_period=self.forecast_period, epochs=self.epochs, step_future=self.step_future, step_past=self.step_past,
-                dropout=self.dropout, optimizer=self.optimizer, loss=self.loss)
-            self.finished.emit(forecast_df)
+            self.finished.emit(mc.refresh_sp500_snapshot())
         except Exception as e:
             self.finished.emit(e)
 
 class MainWindow(QMainWindow):
+
+    # bar sizes that can be built from each download interval
+    BAR_SIZES = {
+        '1d': ['1d'],
+        '1h': ['1h', '1d'],
+        '5m': ['5m', '15m', '1h', '1d'],
+        '1m': ['1m', '5m', '15m', '1h', '1d'],
+    }
+
+    # epochs between training checkpoints, a cancelled or crashed run resumes from the last one
+    CHECKPOINT_EVERY = 5
+
+    # numpy engine (see source_Baselines) drawn as a dashed preview right away while the network trains
+    PREVIEW_ENGINE = 'ets'
+    # the forecast kwargs the baseline engines use, the training ones (registry, checkpoints, ...) are for the job only
+    PREVIEW_KWARGS = ('df', 'layers_config', 'target_variable', 'training_cols', 'forecast_period', 'step_past', 'past_years_iter')
+
     def __init__(self, parent=None):
         super().__init__(parent)
         self.ui = Ui_MainWindow()
         self.ui.setupUi(self)
 
-        self.df = None
+        self.df = None  # TimeSeries of the selected ticker at the selected bar size
         self.data_loaded = False
         # self.layer_data = None
         self.model_params = None
+        self.model_registry = ModelRegistry()  # trained models are reused and fine-tuned on new bars
 
-        # setup combobox
-        for ticker in mc.list_sp500_tickers():
+        # setup combobox from the saved snapshot, refreshing it in the background when it is stale
+        tickers, fetched_at = mc.load_sp500_snapshot()
+        for ticker in tickers:
             self.ui.ticker_combobox.addItem(ticker, ticker)
         self.ui.ticker_combobox.setCurrentIndex(-1)
 
+        self.ticker_list_worker = None
+        if mc.sp500_snapshot_is_stale(fetched_at):
+            self.ticker_list_worker = TickerListWorker()
+            self.ticker_list_worker.finished.connect(self.on_ticker_list_refreshed)
+            self.ticker_list_worker.start()
+
+        # interval the data is downloaded at, and the bar size it is shown/modelled at
+        self.interval_label = QLabel("Interval", self.ui.tab1)
+        self.interval_label.setGeometry(QRect(140, 13, 45, 16))
+        self.interval_combobox = QComboBox(self.ui.tab1)
+        self.interval_combobox.setGeometry(QRect(186, 10, 50, 24))
+        self.interval_combobox.addItems(list(self.BAR_SIZES.keys()))
+        self.bars_label = QLabel("Bars", self.ui.tab1)
+        self.bars_label.setGeometry(QRect(244, 13, 25, 16))
+        self.bars_combobox = QComboBox(self.ui.tab1)
+        self.bars_combobox.setGeometry(QRect(270, 10, 50, 24))
+        self.bars_combobox.addItems(self.BAR_SIZES['1d'])
+
+        self.resample_cache = rs.ResampleCache()
+
         self.ui.forecast_progress_label.setVisible(False)
 
         self.ui.createmodel_button.setEnabled(False)
@@ -75,10 +113,40 @@ class MainWindow(QMainWindow):
         self.ui.graph_layout = QVBoxLayout(self.ui.graph_placeholder_widget)
         self.ui.graph_layout.addWidget(self.graph_widget)
 
+        # training tab, live loss chart and the stats of the last epoch
+        self.ui.tabWidget.setTabText(self.ui.tabWidget.indexOf(self.ui.tab2), "Training")
+        self.loss_chart_widget = LossChartWidget(self.ui.tab2)
+        self.loss_chart_widget.setGeometry(QRect(29, 30, 471, 421))
+        self.training_stats_label = QLabel(self.ui.tab2)
+        self.training_stats_label.setGeometry(QRect(29, 460, 471, 40))
+        self.training_stats_label.setWordWrap(True)
+        self.ui.forecast_progress_label.setGeometry(QRect(300, 40, 135, 16))
+
+        # forecasts run as jobs, the loss chart and the cancel button follow the last submitted one
+        # every job trains in its own process so tensorflow never competes with the ui for the GIL
+        self.job_signals = JobSignals()
+        self.job_signals.changed.connect(self.on_job_changed)
+        self.job_signals.progress.connect(self.on_job_progress)
+        self.job_scheduler = JobScheduler(on_change=self.job_signals.changed.emit, on_progress=self.job_signals.progress.emit,
+            runner=ProcessRunner(), configure_threads=False)
+        self.current_job = None
+
+        self.jobs_tab = QWidget()
+        self.job_list_widget = JobListWidget(self.job_scheduler, self.jobs_tab)
+        self.job_list_widget.setGeometry(QRect(10, 10, 505, 505))
+        self.ui.tabWidget.addTab(self.jobs_tab, "Jobs")
+
+        self.cancel_forecast_button = QPushButton("Cancel", self.ui.tab1)
+        self.cancel_forecast_button.setGeometry(QRect(440, 38, 60, 22))
+        self.cancel_forecast_button.setVisible(False)
+        self.cancel_forecast_button.clicked.connect(self.on_cancel_forecast_button_clicked)
+
         # ---- CONNECT SIGNALS ----
 
         # data import stuff
         self.ui.ticker_combobox.currentIndexChanged.connect(self.on_ticker_combobox_changed)
+        self.interval_combobox.currentIndexChanged.connect(self.on_interval_combobox_changed)
+        self.bars_combobox.currentIndexChanged.connect(self.on_bars_combobox_changed)
 
         # model stuff
         self.ui.createmodel_button.clicked.connect(self.on_createmodel_button_clicked)
@@ -102,7 +170,15 @@ class MainWindow(QMainWindow):
     #
     def on_ticker_combobox_changed(self):
         ticker = self.ui.ticker_combobox.currentText()
-        self.df = mc.get_data(ticker)
+        interval = self.interval_combobox.currentText()
+        raw_df = mc.get_data(ticker, interval=interval)
+        if raw_df is None:
+            return
+
+        # build every bar size for this interval up front so switching bars is only a lookup
+        self.resample_cache.set_source(TimeSeries.from_frame(raw_df), interval)
+        self.resample_cache.precompute(self.BAR_SIZES[interval])
+        self.df = self.resample_cache.get(self.bars_combobox.currentText())
 
         self.ui.createmodel_button.setEnabled(True)
 
@@ -111,11 +187,45 @@ class MainWindow(QMainWindow):
         self.show_column_options(True)
         self.graph_widget.set_data(self.df, 'open')
 
+    def on_interval_combobox_changed(self):
+        interval = self.interval_combobox.currentText()
+        self.bars_combobox.blockSignals(True)
+        self.bars_combobox.clear()
+        self.bars_combobox.addItems(self.BAR_SIZES[interval])
+        self.bars_combobox.blockSignals(False)
+
+        if self.ui.ticker_combobox.currentIndex() != -1:
+            self.on_ticker_combobox_changed()
+
+    def on_bars_combobox_changed(self):
+        if self.resample_cache.source is None:
+            return
+        self.df = self.resample_cache.get(self.bars_combobox.currentText())
+        graph_variable = self.ui.cols_combobox.currentText() or 'open'
+        self.graph_widget.set_data(self.df, graph_variable)
+
+    def on_ticker_list_refreshed(self, result):
+        if isinstance(result, Exception):
+            print(f"could not refresh the S&P 500 list, using the saved snapshot: {result}")
+            return
+
+        # merge new tickers in sorted position, keeping the current selection and not reloading data
+        combobox = self.ui.ticker_combobox
+        existing = {combobox.itemText(i) for i in range(combobox.count())}
+        combobox.blockSignals(True)
+        for ticker in result:
+            if ticker in existing:
+                continue
+            index = 0
+            while index < combobox.count() and combobox.itemText(index) < ticker:
+                index += 1
+            combobox.insertItem(index, ticker, ticker)
+            existing.add(ticker)
+        combobox.blockSignals(False)
+
     def show_column_options(self, show):
         if show:
-            filtered_df = self.df.drop(columns=['date'], errors='ignore')
-            column_names = filtered_df.columns.tolist()
-            self.ui.cols_combobox.addItems(column_names)
+            self.ui.cols_combobox.addItems(self.df.column_names)
         else:
             self.ui.cols_combobox.clear()
 
@@ -151,8 +261,7 @@ class MainWindow(QMainWindow):
     #
 
     def on_createmodel_button_clicked(self):
-        filtered_df = self.df.drop(columns=['date'], errors='ignore')
-        column_names = filtered_df.columns.tolist()
+        column_names = self.df.column_names
         target_variable = self.ui.cols_combobox.currentText()
 
         self.window = CreateModelWindow(column_names, target_variable)
@@ -164,52 +273,108 @@ class MainWindow(QMainWindow):
         self.ui.forecast_button.setEnabled(True)
 
     def on_forecast_button_clicked(self):
-        layer_data = self.model_params['layer_widgets_dict']
-        # create layer config and initialize dropout (dropout is in the layer_widgets_dict)
-        layer_neuron_list = []
-        layer_type_list = []
-        layer_return_list = []
-        dropout = 0
-        for i, layer in enumerate(layer_data):
-            if i != len(layer_data)-1:
-                layer_neuron_list.append(layer['neuron_spinbox'])
-                layer_type_list.append(layer['type_combobox'])
-                layer_return_list.append(layer['rseq'])
+        # queue the forecast, an identical job that is still queued or running is reused
+        ticker = f"{self.ui.ticker_combobox.currentText()}_{self.bars_combobox.currentText()}"
+        forecast_kwargs = mc.forecast_kwargs_from_params(self.model_params)
+        forecast_kwargs.update({
+            'df': self.df,
+            'ticker': ticker,
+            'registry': self.model_registry,
+            'checkpoint_every': self.CHECKPOINT_EVERY
+        })
+        job = self.job_scheduler.submit(forecast_kwargs, label=ticker)
+
+        if job is not self.current_job:
+            self.current_job = job
+            self.loss_chart_widget.start(self.model_params['epochs'])
+            self.training_stats_label.setText("")
+        self.show_job_status()
+
+        # the baseline takes milliseconds and tensorflow is not imported for it
+        # it is only a preview, if it can not forecast this data the job's result is simply shown without one
+        if forecast_kwargs['engine'] == 'neural' and job.active:
+            preview_kwargs = {name: forecast_kwargs[name] for name in self.PREVIEW_KWARGS if name in forecast_kwargs}
+            try:
+                preview = fc.forecast(**preview_kwargs, engine=self.PREVIEW_ENGINE)
+            except Exception as e:
+                print(f"skipping the {self.PREVIEW_ENGINE} forecast preview: {e}")
             else:
-                dropout = layer['dropout_spinbox'] / 100
-        layer_count = len(layer_data) - 1 # not including the last dropout layer
-        layers_config = mc.create_layer_config(layer_count, layer_neuron_list, layer_type_list, layer_return_list)
-
-        # run the forecast in a separate thread
-        self.ui.forecast_progress_label.setVisible(True)
-
-        self.forecast_worker = ForecastWorker(self.df, layers_config, self.model_params['target_variable'], self.model_params['training_cols'],
-            self.model_params['forecast_period'], self.model_params['epochs'], self.model_params['step_future'], self.model_params['step_past'],
-            dropout, self.model_params['optimizer'], self.model_params['loss'])
+                self.graph_widget.set_forecast_result(preview.iloc[1:], preview=True)
 
-        self.forecast_worker.finished.connect(self.on_forecast_complete)
-        self.forecast_worker.start()
+    def on_cancel_forecast_button_clicked(self):
+        if self.current_job is not None:
+            self.job_scheduler.cancel(self.current_job)
+            self.cancel_forecast_button.setEnabled(False)
 
     def enableb_forecast(self, bool):
         self.ui.createmodel_button.setEnabled(bool)
         self.ui.forecast_button.setEnabled(bool)
 
-    def on_forecast_complete(self, result):
-        self.ui.forecast_progress_label.setVisible(False)
-        self.enableb_forecast(True) # enable all the buttons here where the thread finishes
-
-        if isinstance(result, Exception):
+    # progress label shows the queue, the cancel button the state of the current job
+    def show_job_status(self):
+        counts = self.job_scheduler.counts()
+        active = counts[js.RUNNING] + counts[js.QUEUED]
+        self.ui.forecast_progress_label.setVisible(active > 0)
+        job = self.current_job
+        if job is not None and job.state == js.RUNNING and job.progress is not None:
+            self.ui.forecast_progress_label.setText(f"Epoch {job.progress['epoch']}/{job.progress['epochs']}, eta {job.progress['eta_s']:.0f}s")
+        elif job is not None and job.active and job.cancel_event.is_set():
+            self.ui.forecast_progress_label.setText("Cancelling...")
+        else:
+            self.ui.forecast_progress_label.setText(f"{counts[js.RUNNING]} running, {counts[js.QUEUED]} queued")
+        self.cancel_forecast_button.setVisible(job is not None and job.active)
+        self.cancel_forecast_button.setEnabled(job is not None and job.active and not job.cancel_event.is_set())
+
+    def on_job_progress(self, job, stats):
+        self.job_list_widget.refresh()
+        if job is not self.current_job:
+            return
+        self.loss_chart_widget.add_epoch(stats)
+        self.show_job_status()
+
+        text = f"epoch {stats['epoch']}/{stats['epochs']} in {stats['epoch_s']:.2f}s"
+        if stats['samples_per_s'] is not None:
+            text += f", {stats['samples_per_s']:.0f} samples/s"
+        text += f", eta {stats['eta_s']:.0f}s"
+        if stats['peak_memory_mb'] is not None:
+            text += f", peak memory {stats['peak_memory_mb']:.0f} MB"
+        self.training_stats_label.setText(text)
+
+    def on_job_changed(self, job):
+        self.job_list_widget.refresh()
+        self.show_job_status()
+
+        # the dashed baseline preview stands in for this job's result, without a result it goes away
+        on_screen = job.label == f"{self.ui.ticker_combobox.currentText()}_{self.bars_combobox.currentText()}"
+        if job.state in (js.CANCELLED, js.FAILED) and on_screen:
+            self.graph_widget.clear_forecast_preview()
+
+        if job.state == js.CANCELLED:
+            if job is self.current_job and job.started_at is not None:
+                self.training_stats_label.setText(f"cancelled after {job.error.epochs_done} epochs, forecasting the same model again resumes from its last checkpoint")
+        elif job.state == js.FAILED:
             # Handle the exception
             error_dialog = QMessageBox()
             error_dialog.setIcon(QMessageBox.Critical)
             error_dialog.setWindowTitle("Forecast Error")
-            error_dialog.setText("An error occurred while forecasting.")
-            print(result)
-            error_dialog.setInformativeText(str(result))  # Show the exception message
+            error_dialog.setText(f"An error occurred while forecasting {job.label}.")
+            print(job.error)
+            error_dialog.setInformativeText(str(job.error))  # Show the exception message
             error_dialog.exec()
-        else:
-            result = result.iloc[1:]
-            self.graph_widget.set_forecast_result(result)
+        elif job.state == js.DONE:
+            if job is self.current_job:
+                epochs = self.loss_chart_widget.epochs
+                if epochs and epochs[-1]['epoch'] < epochs[-1]['epochs']:
+                    self.training_stats_label.setText(self.training_stats_label.text() + f" (stopped early after {epochs[-1]['epoch']} epochs)")
+            # a finished job is drawn if its ticker and bar size are still the ones on screen
+            if on_screen:
+                result = job.result.iloc[1:]
+                self.graph_widget.set_forecast_result(result)
+
+    def closeEvent(self, event):
+        # running forecasts would keep training in the background after the window is gone
+        self.job_scheduler.shutdown(cancel=True, wait=True)
+        super().closeEvent(event)
 
 
 if __name__ == "__main__":
@@ -2,7 +2,9 @@ from PySide6.QtWidgets import QWidget
 from PySide6.QtCore import Qt, QPointF
 from PySide6.QtGui import QPainter, QPen, QColor, QMouseEvent
 
-import pandas as pd
+import numpy as np
+
+from source_TimeSeries import TimeSeries
 
 class GraphWidget(QWidget):
     def __init__(self, parent=None):
@@ -13,6 +15,8 @@ class GraphWidget(QWidget):
         self.margin = 10
         self.line_color = QColor(242, 7, 74)
         self.forecast_line_color = QColor(0, 0, 255)
+        self.preview_line_color = QColor(170, 170, 170)
+        self.forecast_preview = False  # the drawn forecast is a baseline preview (dashed) until the model's result replaces it
         self.background_color = QColor(75, 75, 75)
         self.axis_color = QColor(60, 60, 60)
 
@@ -27,8 +31,10 @@ class GraphWidget(QWidget):
         self.visible_window = 100  # number of data points visible at a time
 
 
+    # df is a TimeSeries (frames are converted once here)
     def set_data(self, df, graph_variable):
-        self.df = None
+        if not isinstance(df, TimeSeries):
+            df = TimeSeries.from_frame(df)
         self.df = df
         self.forecast_len = None
         self.graph_variable = None
@@ -37,12 +43,26 @@ class GraphWidget(QWidget):
         self.visible_start = max(0, len(df) - self.visible_window) # last n points
         self.update()
 
-    def set_forecast_result(self, result_df):
-        self.df = pd.concat([self.df, result_df], ignore_index=True)
+    def set_forecast_result(self, result_df, preview=False):
+        if not isinstance(result_df, TimeSeries):
+            result_df = TimeSeries.from_frame(result_df)
+        # a forecast that is already drawn (e.g. the preview) is replaced
+        if self.forecast_len is not None:
+            self.df = self.df.slice(0, len(self.df) - self.forecast_len)
+        self.df = self.df.append(result_df)
+        self.forecast_preview = preview
         self.forecast_len = len(result_df)
         self.visible_start = max(0, len(self.df) - self.visible_window) # last n points
         self.update()
 
+    # drops a drawn baseline preview (a real forecast result stays)
+    def clear_forecast_preview(self):
+        if self.forecast_len is not None and self.forecast_preview:
+            self.df = self.df.slice(0, len(self.df) - self.forecast_len)
+            self.forecast_len = None
+            self.forecast_preview = False
+            self.update()
+
     def set_params(self, window):
         if window != 'max':
             new_window = window
@@ -98,16 +118,14 @@ class GraphWidget(QWidget):
         painter.setPen(QPen(self.line_color, 2))
         rect = self.rect()
 
-        # visible slice of data
-        visible_data = self.df.iloc[self.visible_start:self.visible_start + self.visible_window]
-        if visible_data.empty:
+        # visible slice of data (a view, nothing is copied)
+        column_data = self.df.column(self.graph_variable, self.visible_start, self.visible_start + self.visible_window)
+        if len(column_data) == 0 or np.isnan(column_data).all():
             return
 
-        column_data = pd.to_numeric(visible_data[self.graph_variable])
-
         # normalize data to center it around the middle line
-        data_min = column_data.min()
-        data_max = column_data.max()
+        data_min = np.nanmin(column_data)
+        data_max = np.nanmax(column_data)
         data_range = data_max - data_min
         midline_y = rect.height() / 2  # y-coordinate for the middle line
 
@@ -119,7 +137,7 @@ class GraphWidget(QWidget):
 
         points = []
         for i, value in enumerate(column_data):
-            x = self.margin + i * ((rect.width() - 2 * self.margin) / (len(visible_data) - 1))
+            x = self.margin + i * ((rect.width() - 2 * self.margin) / (len(column_data) - 1))
             y = midline_y - (value - (data_min + data_range / 2)) * y_scale
             points.append((x, y))
 
@@ -128,6 +146,9 @@ class GraphWidget(QWidget):
             for i in range(len(points) - 1):
                 if i < len(points) - self.forecast_len - 1:
                     painter.drawLine(points[i][0], points[i][1], points[i + 1][0], points[i + 1][1])
+                elif self.forecast_preview:
+                    painter.setPen(QPen(self.preview_line_color, 2, Qt.DashLine))
+                    painter.drawLine(points[i][0], points[i][1], points[i + 1][0], points[i + 1][1])
                 else:
                     painter.setPen(QPen(self.forecast_line_color, 2))
                     painter.drawLine(points[i][0], points[i][1], points[i + 1][0], points[i + 1][1])
@@ -152,12 +173,10 @@ class GraphWidget(QWidget):
         # draw the variable
         if self.df is not None and self.graph_variable is not None:
             # get the visible slice of data
-            visible_data = self.df.iloc[self.visible_start:self.visible_start + self.visible_window]
-            if visible_data.empty:
+            column_data = self.df.column(self.graph_variable, self.visible_start, self.visible_start + self.visible_window)
+            if len(column_data) == 0 or np.isnan(column_data).all():
                 return
 
-            column_data = pd.to_numeric(visible_data[self.graph_variable]).dropna()
-
             # calculate the corresponding index in the data (round to the nearest data point)
             graph_width = rect.width() - 2 * self.margin
             index_offset = (self.mouse_pos.x() - self.margin) / (graph_width / (len(column_data) - 1))
@@ -167,22 +186,24 @@ class GraphWidget(QWidget):
             index = max(0, min(len(column_data) - 1, index))
 
             # draw the graph variable on the crosshair
-            if not column_data.empty:
+            if not np.isnan(column_data[index]):
                 # data point value
-                data_value = column_data.iloc[index]
+                data_value = column_data[index]
                 val_text = f"{self.graph_variable}: {data_value:.2f}"
                 font_metrics = painter.fontMetrics()
                 val_text_width = font_metrics.horizontalAdvance(val_text)
                 painter.drawText(self.mouse_pos.x() - val_text_width - 5, self.mouse_pos.y() - 5, val_text)
                 # data point date
-                date = visible_data['date'].iloc[index]
+                date = self.df.date_at(self.visible_start + index)
                 date_text = f"date: {date}"
                 date_text_width = font_metrics.horizontalAdvance(date_text)
                 painter.drawText(self.mouse_pos.x() - date_text_width - 5, self.mouse_pos.y() + 14, date_text)
 
                 # draw the circle at the current data point
-                x_pos = self.margin + index * ((rect.width() - 2 * self.margin) / (len(visible_data) - 1))
-                y_pos = rect.height() / 2 - (data_value - (column_data.min() + (column_data.max() - column_data.min()) / 2)) * ((rect.height() - 2 * self.margin) / (column_data.max() - column_data.min()))
+                data_min = np.nanmin(column_data)
+                data_max = np.nanmax(column_data)
+                x_pos = self.margin + index * ((rect.width() - 2 * self.margin) / (len(column_data) - 1))
+                y_pos = rect.height() / 2 - (data_value - (data_min + (data_max - data_min) / 2)) * ((rect.height() - 2 * self.margin) / (data_max - data_min))
                 painter.setPen(QPen(QColor(35, 225, 232)))
                 painter.setBrush(QColor(35, 225, 232))
                 painter.drawEllipse(QPointF(x_pos, y_pos), 3, 3)
@@ -197,7 +218,7 @@ class GraphWidget(QWidget):
             self.visible_start = max(0, min(len(self.df) - self.visible_window, new_start))
 
             if self.forecast_len is not None:
-                self.df = self.df.iloc[:-self.forecast_len]
+                self.df = self.df.slice(0, len(self.df) - self.forecast_len)
                 self.forecast_len = None
 
             self.update()
@@ -0,0 +1,76 @@
+from PySide6.QtWidgets import QWidget, QTableWidget, QTableWidgetItem, QPushButton, QAbstractItemView, QHeaderView
+from PySide6.QtCore import QRect, QTimer
+
+import source_JobScheduler as js
+
+# job list panel of a source_JobScheduler.JobScheduler: state, timing and epoch progress of every job
+class JobListWidget(QWidget):
+
+    COLUMNS = ["#", "Job", "State", "Priority", "Waited", "Ran", "Epoch"]
+
+    def __init__(self, scheduler, parent=None):
+        super().__init__(parent)
+        self.scheduler = scheduler
+
+        self.table = QTableWidget(0, len(self.COLUMNS), self)
+        self.table.setGeometry(QRect(0, 0, 505, 470))
+        self.table.setHorizontalHeaderLabels(self.COLUMNS)
+        self.table.verticalHeader().setVisible(False)
+        self.table.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.table.setSelectionMode(QAbstractItemView.SingleSelection)
+        self.table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.table.horizontalHeader().setSectionResizeMode(1, QHeaderView.Stretch)
+
+        self.cancel_button = QPushButton("Cancel", self)
+        self.cancel_button.setGeometry(QRect(0, 478, 80, 24))
+        self.cancel_button.clicked.connect(self.on_cancel_button_clicked)
+        self.run_next_button = QPushButton("Run next", self)
+        self.run_next_button.setGeometry(QRect(86, 478, 80, 24))
+        self.run_next_button.clicked.connect(self.on_run_next_button_clicked)
+
+        # waited / ran columns keep counting while jobs are active
+        self.timer = QTimer(self)
+        self.timer.setInterval(1000)
+        self.timer.timeout.connect(self.refresh)
+
+
+    def selected_job(self):
+        rows = self.table.selectionModel().selectedRows()
+        if not rows:
+            return None
+        return self.scheduler.jobs[rows[0].row()]
+
+    def refresh(self):
+        jobs = list(self.scheduler.jobs)
+        self.table.setRowCount(len(jobs))
+        for row, job in enumerate(jobs):
+            run_s = job.run_s()
+            epoch = f"{job.progress['epoch']}/{job.progress['epochs']}" if job.progress is not None else ""
+            values = [str(job.job_id), job.label or "", job.state, str(job.priority),
+                      f"{job.wait_s():.0f}s", f"{run_s:.0f}s" if run_s is not None else "", epoch]
+            for column, value in enumerate(values):
+                item = self.table.item(row, column)
+                if item is None:
+                    self.table.setItem(row, column, QTableWidgetItem(value))
+                elif item.text() != value:
+                    item.setText(value)
+
+        if any(job.active for job in jobs):
+            if not self.timer.isActive():
+                self.timer.start()
+        else:
+            self.timer.stop()
+
+
+    def on_cancel_button_clicked(self):
+        job = self.selected_job()
+        if job is not None:
+            self.scheduler.cancel(job)
+
+    # moves a queued job in front of every other queued job
+    def on_run_next_button_clicked(self):
+        job = self.selected_job()
+        if job is None or job.state != js.QUEUED:
+            return
+        queued = [other.priority for other in self.scheduler.jobs if other.state == js.QUEUED and other is not job]
+        self.scheduler.set_priority(job, max(queued, default=job.priority) + 1)
@@ -0,0 +1,97 @@
+from PySide6.QtWidgets import QWidget
+from PySide6.QtCore import QPointF
+from PySide6.QtGui import QPainter, QPen, QColor
+
+import numpy as np
+
+# live loss / val_loss chart fed with the per epoch stats of source_Telemetry
+class LossChartWidget(QWidget):
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.epochs = []  # stats dicts in the order they arrived
+        self.total_epochs = None
+        self.margin = 10
+        self.loss_color = QColor(242, 7, 74)
+        self.val_loss_color = QColor(0, 0, 255)
+        self.background_color = QColor(75, 75, 75)
+        self.axis_color = QColor(60, 60, 60)
+        self.text_color = QColor(220, 220, 220)
+
+
+    def start(self, total_epochs):
+        self.epochs = []
+        self.total_epochs = total_epochs
+        self.update()
+
+    def add_epoch(self, stats):
+        # an early stopped or fine-tuning fit reports its own epoch budget
+        self.total_epochs = stats.get('epochs', self.total_epochs)
+        self.epochs.append(stats)
+        self.update()
+
+    def clear_chart(self):
+        self.epochs = []
+        self.total_epochs = None
+        self.update()
+
+
+    def paintEvent(self, event):
+        painter = QPainter(self)
+        painter.setRenderHint(QPainter.Antialiasing)
+
+        # draw background
+        painter.fillRect(self.rect(), self.background_color)
+        # draw axes
+        self.draw_sumlines(painter)
+        # draw losses
+        if self.epochs:
+            self.draw_losses(painter)
+        painter.end()
+
+
+    def draw_sumlines(self, painter):
+        painter.setPen(QPen(self.axis_color, 1))
+        rect = self.rect()
+
+        # horizontal grid lines
+        for i in range(1, 4):
+            y = rect.height() / 4 * i
+            painter.drawLine(0, y, rect.width(), y)
+
+
+    def draw_losses(self, painter):
+        rect = self.rect()
+        loss = np.array([stats['loss'] if stats['loss'] is not None else np.nan for stats in self.epochs], dtype=float)
+        val_loss = np.array([stats['val_loss'] if stats['val_loss'] is not None else np.nan for stats in self.epochs], dtype=float)
+        values = np.concatenate((loss, val_loss))
+        if np.isnan(values).all():
+            return
+
+        # x spans the whole epoch budget so the curves grow to the right as training goes
+        data_min = np.nanmin(values)
+        data_max = np.nanmax(values)
+        data_range = data_max - data_min
+        y_scale = 0 if data_range == 0 else (rect.height() - 2 * self.margin - 20) / data_range
+        slots = max(len(self.epochs), self.total_epochs or 0, 2) - 1
+
+        def to_point(i, value):
+            x = self.margin + i * ((rect.width() - 2 * self.margin) / slots)
+            y = rect.height() - self.margin - (value - data_min) * y_scale
+            return QPointF(x, y)
+
+        for series, color in ((loss, self.loss_color), (val_loss, self.val_loss_color)):
+            painter.setPen(QPen(color, 2))
+            for i in range(len(series) - 1):
+                if not np.isnan(series[i]) and not np.isnan(series[i + 1]):
+                    painter.drawLine(to_point(i, series[i]), to_point(i + 1, series[i + 1]))
+            if len(series) == 1 and not np.isnan(series[0]):
+                painter.drawEllipse(to_point(0, series[0]), 2, 2)
+
+        # legend with the latest values
+        last = self.epochs[-1]
+        painter.setPen(QPen(self.loss_color))
+        loss_text = f"loss: {last['loss']:.5f}" if last['loss'] is not None else "loss: -"
+        painter.drawText(self.margin, self.margin + 8, loss_text)
+        painter.setPen(QPen(self.val_loss_color))
+        val_text = f"val_loss: {last['val_loss']:.5f}" if last['val_loss'] is not None else "val_loss: -"
+        painter.drawText(self.margin + painter.fontMetrics().horizontalAdvance(loss_text) + 15, self.margin + 8, val_text)